@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -16,6 +17,115 @@ class Settings(BaseSettings):
     # Optional regex. Example:
     # CORS_ALLOW_ORIGIN_REGEX=^http://(localhost|127\.0\.0\.1)(:\d+)?$
     cors_allow_origin_regex: str = ""
+    # OpenAI client (アプリ全体で共有する接続プール。空なら公式のエンドポイント)
+    openai_base_url: str = ""
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 60.0  # 秒
+    openai_connect_timeout: float = 5.0
+    # 読み取りタイムアウトの上限（チャットでは締め切りの残り時間の方が短ければそちらを使う）
+    openai_read_timeout: float = 60.0
+    # CiNii Books OpenSearch のURL（空なら公式のエンドポイント。ベンチマークではスタブを指定する）
+    cinii_api_url: str = ""
+    # CiNii Books のレコードURLの前半（{base}{NCID}.json。空なら https://ci.nii.ac.jp/ncid/）
+    cinii_record_base_url: str = ""
+    # CiNii HTTP client (アプリ全体で共有する接続プール)
+    cinii_max_connections: int = 20
+    cinii_max_keepalive_connections: int = 10
+    cinii_keepalive_expiry: float = 30.0  # 秒
+    cinii_connect_timeout: float = 5.0
+    cinii_read_timeout: float = 30.0
+    cinii_pool_timeout: float = 5.0
+    # HTTP/2を使う場合は h2 パッケージが必要（pip install "httpx[http2]"）
+    cinii_http2: bool = False
+    # CiNiiへの流量制御（AIMDで調整するトークンバケット）・再試行・サーキットブレーカー
+    cinii_rate_limit: float = 5.0  # 初期レート（リクエスト/秒）
+    cinii_rate_limit_min: float = 0.5
+    cinii_rate_limit_max: float = 10.0
+    cinii_rate_limit_burst: int = 5
+    cinii_max_retries: int = 2
+    cinii_retry_base_delay: float = 0.5  # 秒
+    cinii_retry_max_delay: float = 5.0
+    cinii_breaker_failure_threshold: int = 5  # 連続失敗回数
+    cinii_breaker_reset_timeout: float = 30.0  # open後に試行を再開するまでの秒数
+    # ヘッジ: 直近のp95を過ぎても応答がなければ同じGETをもう1本送り、先に返った方を使う
+    cinii_hedge_enabled: bool = False
+    cinii_hedge_min_delay: float = 0.2  # 秒（p95がこれより短くてもこの秒数は待つ）
+    # 複数ページ取得（/books/search/deep とチャットの候補プール）
+    cinii_page_size: int = 20
+    cinii_page_concurrency: int = 4
+    cinii_deep_max_results: int = 200
+    # 検索結果キャッシュ（1段目: プロセス内LRU、2段目: Redis互換の共有キャッシュ）
+    search_cache_enabled: bool = True
+    search_cache_max_entries: int = 1024
+    search_cache_max_bytes: int = 32 * 1024 * 1024
+    search_cache_ttl: float = 600.0  # 秒
+    search_cache_stale_ttl: float = 300.0  # TTL切れ後もこの秒数は古い値を返しつつ裏で再取得する
+    search_cache_negative_ttl: float = 60.0  # 0件結果のキャッシュ期間
+    # 例: redis://localhost:6379/0（空なら2段目は使わない。redis パッケージが必要）
+    search_cache_redis_url: str = ""
+    # ローカル書誌索引（SQLite FTS5）
+    # off: 使わない / write: CiNiiの結果を保存するだけ / local_first: 鮮度内のヒットが十分なら索引から返す
+    book_index_mode: Literal["off", "write", "local_first"] = "off"
+    book_index_path: str = "data/books.sqlite3"
+    book_index_max_age: float = 7 * 24 * 3600.0  # 秒
+    book_index_min_hits: int = 10  # これ未満（かつcount未満）ならCiNiiに問い合わせる
+    # 段階ごとのモデル名（chat_model: 検索するか判断するラウンド / chat_answer_model: ツールを使わない回答）
+    chat_model: str = "gpt-4o-mini"
+    chat_answer_model: str = "gpt-4o-mini"
+    # 規則ベースの意図判定で、明示的な検索はCiNiiを直接検索し、挨拶などは検索判断のラウンドを省く
+    chat_intent_routing: bool = False
+    # 書誌詳細（件名・注記）の補完。tool callの検索結果の上位 top_n 件をCiNiiのレコードから並列に取得して長期間キャッシュする
+    book_enrichment_enabled: bool = False
+    book_enrichment_top_n: int = 5
+    book_enrichment_concurrency: int = 4
+    # tool結果をこの秒数以上待たせない（間に合わなかった分は裏で取得を続け、次回以降に使う）
+    book_enrichment_budget: float = 1.0
+    book_enrichment_timeout: float = 5.0  # 1件あたり
+    book_enrichment_cache_path: str = "data/book_details.sqlite3"
+    book_enrichment_cache_ttl: float = 30 * 24 * 3600.0  # 秒
+    # 先読み。ターンの終了後、次に聞かれそうな検索（入門・新書付き、結果に多い著者、最近の出版年）を裏で実行して検索キャッシュを温める
+    chat_prefetch_enabled: bool = False
+    chat_prefetch_max_queries: int = 4  # 1ターンあたり
+    chat_prefetch_concurrency: int = 2
+    chat_prefetch_max_pending: int = 16  # これを超える先読みは捨てる
+    # レートリミッターのトークンがこれ未満なら先読みしない（チャットの検索の分を残す）
+    chat_prefetch_min_tokens: float = 2.0
+    chat_prefetch_timeout: float = 10.0
+    # 1ターン内の複数tool call（search_books）を並列実行するときの同時実行数
+    chat_tool_concurrency: int = 4
+    # 0より大きければ、tool callの検索で複数ページからこの件数まで候補を集めて所蔵館数順に選ぶ
+    chat_candidate_pool: int = 0
+    # tool callの検索結果を所蔵館数・検索語との一致・新しさで採点し、版違いをまとめて上位 count 件にする
+    chat_ranking_enabled: bool = False
+    # エージェントループの予算（検索→再検索のラウンド数、CiNii呼び出し回数、締め切り秒数）
+    chat_max_rounds: int = 3
+    chat_max_cinii_calls: int = 6
+    # chat_deadline_seconds はリクエスト全体の締め切りで、OpenAI・CiNiiの各呼び出しは残り時間で打ち切る
+    chat_deadline_seconds: float = 60.0
+    # 最終回答の生成用に残しておく秒数（検索はこれを差し引いた締め切りまで）
+    chat_answer_reserve_seconds: float = 10.0
+    # 会話履歴のトークン予算（超えた古いターンは要約メモに圧縮）と、要約メモ1行あたりの文字数
+    chat_history_token_budget: int = 3000
+    chat_history_memo_chars: int = 60
+    # LLMに渡す検索結果の形式: json(全項目) / minimal(必要項目のみ・null省略) / table(列形式)
+    chat_tool_result_format: Literal["json", "minimal", "table"] = "minimal"
+    # デバッグログ（logイベント）を生成するか。リクエストの debug で個別に切り替えられる
+    chat_debug_logs: bool = True
+    # チャット応答キャッシュ（直近 max_history 件までの履歴 + メッセージが同じ・よく似た質問に前回の回答を返す）
+    chat_response_cache_enabled: bool = False
+    chat_response_cache_max_entries: int = 512
+    chat_response_cache_ttl: float = 3600.0  # 秒
+    chat_response_cache_similarity: float = 0.85  # 内容語bigramのDice係数のしきい値
+    chat_response_cache_max_history: int = 2
+
+    # サーバー側の会話セッション（memory: ワーカーごと / sqlite: 同じホストの全ワーカーで共有）
+    session_store: Literal["memory", "sqlite"] = "memory"
+    session_store_path: str = "data/sessions.sqlite3"
+    session_ttl: float = 24 * 3600.0  # 最後のやり取りからの秒数
+    session_max_messages: int = 40  # 超えた古いターンは要約メモに移す
+    session_max_books: int = 50  # 紹介済みとして保持する本の上限
+    session_max_sessions: int = 10000  # memory の場合の保持数上限
 
     def cors_origins_list(self) -> list[str]:
         origins = [o.strip() for o in self.cors_allow_origins.split(",")]
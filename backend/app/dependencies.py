@@ -0,0 +1,14 @@
+from typing import Optional
+import httpx
+from fastapi import Request
+from openai import AsyncOpenAI
+
+
+def get_cinii_client(request: Request) -> httpx.AsyncClient:
+    """lifespanで作成した共有CiNiiクライアントを返す"""
+    return request.app.state.cinii_client
+
+
+def get_openai_client(request: Request) -> Optional[AsyncOpenAI]:
+    """lifespanで作成した共有OpenAIクライアントを返す（APIキー未設定ならNone）"""
+    return request.app.state.openai_client
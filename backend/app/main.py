@@ -1,16 +1,59 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import books, chat
+from fastapi.responses import PlainTextResponse
+from app.routers import books, chat, sessions
 from app.config import get_settings
+from app.services.book_index import get_book_index
+from app.services.cinii import search_flight
+from app.services.enrichment import get_book_enricher
+from app.services.prefetch import get_search_prefetcher
+from app.services.http_client import create_cinii_client, create_openai_client
+from app.services.metrics import render_metrics
+from app.services.search_cache import get_search_cache
+from app.services.sessions import get_session_store
+
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリ全体で共有するリソースの作成と破棄"""
+    app.state.cinii_client = create_cinii_client(settings)
+    app.state.openai_client = create_openai_client(settings) if settings.openai_api_key else None
+    try:
+        yield
+    finally:
+        # 裏で動くタスク（先読み・補完・CiNiiへの取得）→ キャッシュ・ストア → HTTPクライアントの順に閉じる
+        prefetcher = get_search_prefetcher()
+        if prefetcher is not None:
+            await prefetcher.aclose()
+        enricher = get_book_enricher()
+        if enricher is not None:
+            await enricher.aclose()
+        await search_flight.aclose()
+        cache = get_search_cache()
+        if cache is not None:
+            await cache.aclose()
+        index = get_book_index()
+        if index is not None:
+            index.close()
+        await get_session_store().aclose()
+        if enricher is not None:
+            enricher.cache.close()
+        await app.state.cinii_client.aclose()
+        if app.state.openai_client is not None:
+            await app.state.openai_client.close()
+
 
 app = FastAPI(
     title="Book Info Chat API",
     description="自然言語で本を検索・推薦するチャットボットのバックエンドAPI",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS設定（Next.jsフロントエンドからのアクセスを許可）
-settings = get_settings()
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list(),
@@ -23,9 +66,16 @@ app.add_middleware(
 # ルーター登録
 app.include_router(books.router)
 app.include_router(chat.router)
+app.include_router(sessions.router)
 
 
 @app.get("/health")
 async def health_check():
     """ヘルスチェック用エンドポイント"""
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus形式のメトリクス（OpenAI・CiNiiのレイテンシ、トークン数、エラー件数など）"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
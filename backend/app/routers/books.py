@@ -1,12 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.book import BookSearchParams, BookSearchResponse
-from app.services.cinii import search_books, CiNiiAPIError
+import json
+from contextlib import aclosing
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.dependencies import get_cinii_client
+from app.schemas.book import Book, BookDeepSearchParams, BookSearchParams, BookSearchResponse
+from app.services.cinii import (
+    RETRYABLE_ERROR_TYPES,
+    CiNiiAPIError,
+    iter_books_deep,
+    search_books,
+    search_books_deep,
+    search_flight,
+)
+from app.services.enrichment import get_book_enricher
+from app.services.prefetch import get_search_prefetcher
+from app.services.resilience import get_circuit_breaker, get_latency_tracker, get_rate_limiter
+from app.services.search_cache import get_search_cache
 
 router = APIRouter(prefix="/books", tags=["books"])
 
 
 @router.post("/search", response_model=BookSearchResponse)
-async def search_books_endpoint(params: BookSearchParams) -> BookSearchResponse:
+async def search_books_endpoint(
+    params: BookSearchParams,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+) -> BookSearchResponse:
     """
     書籍を検索する（CiNii Books API経由）
 
@@ -14,23 +33,125 @@ async def search_books_endpoint(params: BookSearchParams) -> BookSearchResponse:
     エラーはLLM向けに分類して返す。
     """
     try:
-        return await search_books(params)
+        return await search_books(params, cinii_client)
     except CiNiiAPIError as e:
-        # LLM向けのエラーレスポンス（再試行可能かどうかを判断できるように）
-        status_code = {
-            "invalid_input": 400,
-            "config_error": 500,
-            "timeout": 504,
-            "rate_limit": 429,
-            "api_error": 502,
-            "connection_error": 503,
-        }.get(e.error_type, 500)
-
-        raise HTTPException(
-            status_code=status_code,
-            detail={
-                "error_type": e.error_type,
-                "message": e.message,
-                "retryable": e.error_type in ["timeout", "rate_limit", "connection_error"],
+        raise _to_http_exception(e)
+
+
+@router.post("/search/deep", response_model=BookSearchResponse)
+async def search_books_deep_endpoint(
+    params: BookDeepSearchParams,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+) -> BookSearchResponse:
+    """
+    複数ページにまたがって書籍を検索する（最大 limit 件）
+
+    ページは並列に取得し、CiNiiの順位順・重複除去済みで返す。
+    """
+    try:
+        return await search_books_deep(params, cinii_client, params.limit)
+    except CiNiiAPIError as e:
+        raise _to_http_exception(e)
+
+
+@router.post("/search/stream")
+async def search_books_stream_endpoint(
+    params: BookDeepSearchParams,
+    request: Request,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+):
+    """
+    書籍を検索し、1冊ずつストリーミングで返す（最大 limit 件）
+
+    Acceptに text/event-stream を含む場合はSSE、それ以外はNDJSONで返す。
+    各レコードは {"type": "book", "data": Book}、最後に
+    {"type": "done", "data": {"total": ..., "query_used": ...}} を送る。
+    """
+    items = iter_books_deep(params, cinii_client, params.limit)
+    # 1件目までに起きたエラーは通常のHTTPエラーとして返す
+    try:
+        first = await items.__anext__()
+    except CiNiiAPIError as e:
+        raise _to_http_exception(e)
+
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(record: dict) -> str:
+        line = json.dumps(record, ensure_ascii=False)
+        return f"data: {line}\n\n" if use_sse else line + "\n"
+
+    def to_record(item: Book | BookSearchResponse) -> dict:
+        if isinstance(item, Book):
+            return {"type": "book", "data": item.model_dump()}
+        return {"type": "done", "data": {"total": item.total, "query_used": item.query_used}}
+
+    async def record_generator():
+        # クライアントが切断したら、GCを待たずに先読み中のページの取得を止める
+        async with aclosing(items):
+            yield encode(to_record(first))
+            try:
+                async for item in items:
+                    yield encode(to_record(item))
+            except CiNiiAPIError as e:
+                yield encode({"type": "error", "data": _to_http_exception(e).detail})
+
+    if use_sse:
+        return StreamingResponse(
+            record_generator(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
             }
         )
+    return StreamingResponse(record_generator(), media_type="application/x-ndjson")
+
+
+def _to_http_exception(e: CiNiiAPIError) -> HTTPException:
+    # LLM向けのエラーレスポンス（再試行可能かどうかを判断できるように）
+    status_code = {
+        "invalid_input": 400,
+        "config_error": 500,
+        "timeout": 504,
+        "deadline_exceeded": 504,
+        "rate_limit": 429,
+        "api_error": 502,
+        "connection_error": 503,
+        "circuit_open": 503,
+    }.get(e.error_type, 500)
+
+    return HTTPException(
+        status_code=status_code,
+        detail={
+            "error_type": e.error_type,
+            "message": e.message,
+            "retryable": e.error_type in RETRYABLE_ERROR_TYPES,
+        }
+    )
+
+
+@router.get("/cache/stats")
+async def search_cache_stats() -> dict:
+    """検索キャッシュのヒット/ミス/追い出し回数などを返す（監視用）"""
+    cache = get_search_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
+
+
+@router.get("/inflight/stats")
+async def search_inflight_stats() -> dict:
+    """同時実行中の同一検索をまとめた回数（coalesced）などを返す（監視用）"""
+    return search_flight.snapshot()
+
+
+@router.get("/upstream/stats")
+async def upstream_stats() -> dict:
+    """CiNii向けレートリミッター・サーキットブレーカー・応答時間（ヘッジ）の状態を返す（監視用）"""
+    return {
+        "rate_limiter": get_rate_limiter().snapshot(),
+        "circuit_breaker": get_circuit_breaker().snapshot(),
+        "latency": get_latency_tracker().snapshot(),
+        "enrichment": enricher.snapshot() if (enricher := get_book_enricher()) is not None else None,
+        "prefetch": prefetcher.snapshot() if (prefetcher := get_search_prefetcher()) is not None else None,
+    }
@@ -1,37 +1,65 @@
 import json
-from fastapi import APIRouter
+from typing import Optional
+import httpx
+from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+from app.config import get_settings
+from app.dependencies import get_cinii_client, get_openai_client
 from app.schemas.chat import ChatRequest, ChatResponse
-from app.services.chat import process_chat, process_chat_stream
+from app.services.chat import cached_chat_stream, process_chat
+from app.services.deadline import Deadline
+from app.services.response_cache import get_response_cache
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.post("", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest) -> ChatResponse:
+async def chat_endpoint(
+    request: ChatRequest,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+) -> ChatResponse:
     """
     チャットメッセージを処理する
 
     ユーザーのメッセージと会話履歴を受け取り、
     必要に応じて本を検索して推薦文を返す。
+    リクエスト全体に CHAT_DEADLINE_SECONDS の締め切りを設ける。
     """
+    deadline = Deadline.after(get_settings().chat_deadline_seconds)
     return await process_chat(
         message=request.message,
         history=request.history,
+        cinii_client=cinii_client,
+        openai_client=openai_client,
+        deadline=deadline,
+        debug=request.debug,
     )
 
 
 @router.post("/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+):
     """
     チャットメッセージをストリーミングで処理する（SSE）
 
     各処理ステップをリアルタイムでクライアントに送信する。
+    締め切りはリクエスト受信時点から数える。
     """
+    deadline = Deadline.after(get_settings().chat_deadline_seconds)
+
     async def event_generator():
-        async for event in process_chat_stream(
+        async for event in cached_chat_stream(
             message=request.message,
             history=request.history,
+            cinii_client=cinii_client,
+            openai_client=openai_client,
+            deadline=deadline,
+            debug=request.debug,
         ):
             yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
@@ -43,3 +71,12 @@ async def chat_stream_endpoint(request: ChatRequest):
             "Connection": "keep-alive",
         }
     )
+
+
+@router.get("/cache/stats")
+async def response_cache_stats() -> dict:
+    """応答キャッシュのヒット率・節約できた時間などを返す（監視用）"""
+    cache = get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
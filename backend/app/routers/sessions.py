@@ -0,0 +1,132 @@
+import json
+from typing import Optional
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+from app.config import get_settings
+from app.dependencies import get_cinii_client, get_openai_client
+from app.schemas.chat import ChatMessage, ChatResponse, DebugLogEntry
+from app.schemas.session import SessionChatRequest, SessionResponse
+from app.services.chat import cached_chat_stream
+from app.services.deadline import Deadline
+from app.services.sessions import Session, get_session_store
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+
+@router.post("", response_model=SessionResponse, status_code=201)
+async def create_session() -> SessionResponse:
+    """会話セッションを作成する（以降は /sessions/{id}/chat に今回のメッセージだけを送る）"""
+    store = get_session_store()
+    session = Session.new()
+    await store.save(session)
+    return _to_response(session, store.ttl)
+
+
+@router.get("/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str) -> SessionResponse:
+    """セッションの履歴と紹介済みの本を返す"""
+    store = get_session_store()
+    return _to_response(await _load(session_id), store.ttl)
+
+
+@router.delete("/{session_id}", status_code=204)
+async def delete_session(session_id: str) -> Response:
+    if not await get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="セッションが見つかりません")
+    return Response(status_code=204)
+
+
+@router.post("/{session_id}/chat", response_model=ChatResponse)
+async def session_chat(
+    session_id: str,
+    request: SessionChatRequest,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+) -> ChatResponse:
+    """セッションの履歴を使ってチャットメッセージを処理する（/chat と同じレスポンス）"""
+    session = await _load(session_id)
+    debug_logs = []
+    result = ChatResponse(message="")
+    async for event in _session_chat_events(session, request, cinii_client, openai_client):
+        if event["type"] == "log":
+            debug_logs.append(DebugLogEntry(**event["data"]))
+        elif event["type"] == "done":
+            result = ChatResponse(message=event["data"]["message"], books=event["data"]["books"])
+        elif event["type"] == "error":
+            result = ChatResponse(message=event["data"]["message"])
+    result.debug_logs = debug_logs or None
+    return result
+
+
+@router.post("/{session_id}/chat/stream")
+async def session_chat_stream(
+    session_id: str,
+    request: SessionChatRequest,
+    cinii_client: httpx.AsyncClient = Depends(get_cinii_client),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+):
+    """/sessions/{id}/chat のストリーミング版（SSE、イベントは /chat/stream と同じ）"""
+    session = await _load(session_id)
+
+    async def event_generator():
+        async for event in _session_chat_events(session, request, cinii_client, openai_client):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+async def _session_chat_events(
+    session: Session,
+    request: SessionChatRequest,
+    cinii_client: httpx.AsyncClient,
+    openai_client: Optional[AsyncOpenAI],
+):
+    """チャットのイベントを中継し、doneまで届いたターンだけをセッションに保存する"""
+    settings = get_settings()
+    deadline = Deadline.after(settings.chat_deadline_seconds)
+    async for event in cached_chat_stream(
+        message=request.message,
+        history=session.history(),
+        cinii_client=cinii_client,
+        openai_client=openai_client,
+        deadline=deadline,
+        debug=request.debug,
+        notes=session.notes(),
+    ):
+        if event["type"] == "done":
+            session.record_turn(
+                request.message,
+                event["data"]["message"],
+                event["data"]["books"],
+                settings.session_max_messages,
+                settings.session_max_books,
+                settings.chat_history_memo_chars,
+            )
+            await get_session_store().save(session)
+        yield event
+
+
+async def _load(session_id: str) -> Session:
+    session = await get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="セッションが見つかりません")
+    return session
+
+
+def _to_response(session: Session, ttl: float) -> SessionResponse:
+    return SessionResponse(
+        session_id=session.id,
+        messages=[ChatMessage(**msg) for msg in session.messages],
+        books=session.books,
+        summary=session.summary,
+        expires_at=session.updated_at + ttl,
+    )
@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from typing import Optional
 
+MAX_SEARCH_COUNT = 20  # CiNii 1回あたりの取得件数の上限
+
 
 class BookSearchParams(BaseModel):
     """検索パラメータ（LLMのtool callingから渡される）"""
@@ -11,6 +13,12 @@ class BookSearchParams(BaseModel):
     year_from: Optional[int] = None  # 出版年（から）
     year_to: Optional[int] = None  # 出版年（まで）
     count: int = 10  # 取得件数
+    page: int = 1  # ページ番号（CiNiiの p パラメータ）
+
+
+class BookDeepSearchParams(BookSearchParams):
+    """複数ページにまたがる検索のパラメータ"""
+    limit: int = 100  # 取得したい合計件数
 
 
 class Book(BaseModel):
@@ -21,7 +29,8 @@ class Book(BaseModel):
     publisher: Optional[str] = None
     year: Optional[str] = None
     isbn: Optional[str] = None
-    description: Optional[str] = None
+    description: Optional[str] = None  # 注記・内容紹介（書誌詳細の補完で埋まる）
+    subjects: Optional[list[str]] = None  # 件名（書誌詳細の補完で埋まる）
     owner_count: Optional[int] = None  # 所蔵館数
     cinii_url: str
 
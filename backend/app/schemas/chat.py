@@ -11,13 +11,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: list[ChatMessage] = []
+    debug: Optional[bool] = None  # デバッグログを返すか（省略時は設定 CHAT_DEBUG_LOGS に従う）
 
 
 class DebugLogEntry(BaseModel):
     timestamp: str
-    type: Literal["openai_request", "openai_response", "tool_call", "tool_result", "cinii_request", "cinii_response", "error"]
+    type: Literal["openai_request", "openai_response", "tool_call", "tool_result", "cinii_request", "cinii_response", "response_cache", "intent", "error"]
     summary: str
     details: Optional[dict] = None
+    elapsed_ms: Optional[float] = None  # リクエスト開始からの経過時間
+    duration_ms: Optional[float] = None  # 直前のログからの経過時間
 
 
 class ChatResponse(BaseModel):
@@ -0,0 +1,16 @@
+from typing import Optional
+from pydantic import BaseModel
+from app.schemas.chat import ChatMessage
+
+
+class SessionChatRequest(BaseModel):
+    message: str  # 今回のメッセージだけを送る（履歴はサーバー側に保存済み）
+    debug: Optional[bool] = None
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    messages: list[ChatMessage] = []
+    books: list[dict] = []  # これまでに紹介した本（新しい順）
+    summary: list[str] = []  # 上限を超えて要約メモに移した古いターン
+    expires_at: float  # UNIX時刻
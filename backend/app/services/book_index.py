@@ -0,0 +1,197 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+from app.config import get_settings
+from app.schemas.book import MAX_SEARCH_COUNT, Book, BookSearchParams, BookSearchResponse
+
+_YEAR_RE = re.compile(r"\d{4}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    isbn TEXT UNIQUE,
+    title TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    publisher TEXT,
+    year TEXT,
+    year_num INTEGER,
+    description TEXT,
+    owner_count INTEGER,
+    cinii_url TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_year_num ON books(year_num);
+CREATE INDEX IF NOT EXISTS books_updated_at ON books(updated_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title, authors, publisher,
+    content='books', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS books_ai AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts(rowid, title, authors, publisher)
+    VALUES (new.rowid, new.title, new.authors, new.publisher);
+END;
+CREATE TRIGGER IF NOT EXISTS books_ad AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts(books_fts, rowid, title, authors, publisher)
+    VALUES ('delete', old.rowid, old.title, old.authors, old.publisher);
+END;
+"""
+
+_UPSERT = """
+INSERT OR REPLACE INTO books
+    (id, isbn, title, authors, publisher, year, year_num, description, owner_count, cinii_url, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 検索条件の項目とFTSの列の対応（queryは全列が対象）
+_FIELD_COLUMNS = {
+    "query": ("title", "authors", "publisher"),
+    "title": ("title",),
+    "author": ("authors",),
+    "publisher": ("publisher",),
+}
+
+
+class BookIndex:
+    """CiNiiから取得した書誌情報のローカル索引（SQLite FTS5）
+
+    CiNii IDとISBNで一意になり、同じ本を再取得すると上書きされる。
+    1件あたりの読み書きは数ミリ秒以内なので、イベントループ上で同期的に呼び出す。
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE で消える行にもFTSの削除トリガーを効かせる
+        self._conn.execute("PRAGMA recursive_triggers=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def upsert(self, books: Iterable[Book], updated_at: Optional[float] = None) -> int:
+        """本を登録・更新する（戻り値は書き込んだ件数）"""
+        now = updated_at if updated_at is not None else time.time()
+        rows = [_to_row(book, now) for book in books if book.id]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def search(
+        self,
+        params: BookSearchParams,
+        max_age: Optional[float] = None,
+        min_hits: Optional[int] = None,
+    ) -> Optional[BookSearchResponse]:
+        """索引から検索する。鮮度内のヒットが min_hits 件未満ならNoneを返す"""
+        count = max(1, min(params.count, MAX_SEARCH_COUNT))
+        required = count if min_hits is None else min(min_hits, count)
+
+        conditions = []
+        args: list = []
+        for field, columns in _FIELD_COLUMNS.items():
+            value = getattr(params, field)
+            if not value:
+                continue
+            for term in value.split():
+                condition, term_args = _term_condition(term, columns)
+                conditions.append(condition)
+                args.extend(term_args)
+        if not conditions:
+            return None
+        if params.year_from:
+            conditions.append("year_num >= ?")
+            args.append(params.year_from)
+        if params.year_to:
+            conditions.append("year_num <= ?")
+            args.append(params.year_to)
+        if max_age is not None:
+            conditions.append("updated_at >= ?")
+            args.append(time.time() - max_age)
+
+        where = " AND ".join(conditions)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM books WHERE {where}", args).fetchone()[0]
+            if total < required:
+                return None
+            rows = self._conn.execute(
+                f"SELECT id, isbn, title, authors, publisher, year, description, owner_count, cinii_url "
+                f"FROM books WHERE {where} ORDER BY owner_count DESC NULLS LAST, rowid LIMIT ?",
+                [*args, count],
+            ).fetchall()
+
+        query_used = {k: v for k, v in params.model_dump().items() if v is not None}
+        query_used["count"] = count
+        query_used["source"] = "local_index"
+        return BookSearchResponse(total=total, books=[_from_row(row) for row in rows], query_used=query_used)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _term_condition(term: str, columns: tuple[str, ...]) -> tuple[str, list]:
+    """1語分の検索条件。trigramは3文字以上が必要なので、短い語はLIKEで探す"""
+    if len(term) >= 3:
+        phrase = '"' + term.replace('"', '""') + '"'
+        column_filter = "{" + " ".join(columns) + "}"
+        return (
+            "rowid IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)",
+            [f"{column_filter} : {phrase}"],
+        )
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    likes = " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in columns)
+    return f"({likes})", [pattern] * len(columns)
+
+
+def _to_row(book: Book, updated_at: float) -> tuple:
+    year_match = _YEAR_RE.search(book.year) if book.year else None
+    return (
+        book.id,
+        book.isbn or None,
+        book.title,
+        json.dumps(book.authors, ensure_ascii=False),
+        book.publisher,
+        book.year,
+        int(year_match.group()) if year_match else None,
+        book.description,
+        book.owner_count,
+        book.cinii_url,
+        updated_at,
+    )
+
+
+def _from_row(row: tuple) -> Book:
+    book_id, isbn, title, authors, publisher, year, description, owner_count, cinii_url = row
+    return Book(
+        id=book_id,
+        title=title,
+        authors=json.loads(authors),
+        publisher=publisher,
+        year=year,
+        isbn=isbn,
+        description=description,
+        owner_count=owner_count,
+        cinii_url=cinii_url,
+    )
+
+
+@lru_cache
+def get_book_index() -> Optional[BookIndex]:
+    """設定に基づいてアプリ共有のローカル索引を返す（無効ならNone）"""
+    settings = get_settings()
+    if settings.book_index_mode == "off":
+        return None
+    return BookIndex(settings.book_index_path)
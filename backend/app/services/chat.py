@@ -1,25 +1,59 @@
+import asyncio
 import json
+import time
+import httpx
 from datetime import datetime
-from typing import AsyncGenerator
-from openai import AsyncOpenAI, AuthenticationError, APIError
+from typing import AsyncGenerator, Optional
+from openai import AsyncOpenAI, AsyncStream, AuthenticationError, APIError, APITimeoutError
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from pydantic import ValidationError
 from app.config import get_settings
 from app.schemas.chat import ChatMessage, ChatResponse, DebugLogEntry
-from app.schemas.book import BookSearchParams
-from app.services.cinii import search_books, CiNiiAPIError
-
-
-def create_log(
-    log_type: str,
-    summary: str,
-    details: dict | None = None
-) -> DebugLogEntry:
-    """デバッグログエントリを作成"""
-    return DebugLogEntry(
-        timestamp=datetime.now().isoformat(),
-        type=log_type,
-        summary=summary,
-        details=details,
-    )
+from app.schemas.book import Book, BookSearchParams, BookSearchResponse
+from app.services.cinii import search_books, search_books_deep, CiNiiAPIError
+from app.services.deadline import Deadline
+from app.services.enrichment import get_book_enricher
+from app.services.metrics import (
+    CHAT_INTENTS,
+    CHAT_TOOL_CALLS,
+    OPENAI_FIRST_CHUNK_SECONDS,
+    OPENAI_REQUEST_SECONDS,
+    OPENAI_TOKENS,
+)
+from app.services.intent import Intent, classify_intent
+from app.services.history import build_messages, compact_book_reference, count_message_tokens
+from app.services.openai_stream import StreamedCompletion
+from app.services.prefetch import followup_searches, get_search_prefetcher
+from app.services.ranking import rank_books
+from app.services.response_cache import get_response_cache
+from app.services.tool_payload import encode_search_result
+
+
+class DebugLog:
+    """デバッグログイベントを作る（DebugLogEntryと同じ形のdict）
+
+    無効な場合、呼び出し側は enabled を見てログの組み立て自体を省く。
+    経過時間は単調時計で測り、リクエスト開始からの時間と直前のログからの時間を付ける。
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def event(self, log_type: str, summary: str, details: dict | None = None) -> dict:
+        now = time.monotonic()
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "type": log_type,
+            "summary": summary,
+            "details": details,
+            "elapsed_ms": round((now - self.started) * 1000, 1),
+            "duration_ms": round((now - self._last) * 1000, 1),
+        }
+        self._last = now
+        return {"type": "log", "data": entry}
 
 
 # Tool定義（search_books）
@@ -82,161 +116,465 @@ SYSTEM_PROMPT = """あなたは本を推薦するチャットボットです。
 - 雑談から興味を引き出し、検索キーワードを工夫する
 
 ## 注意点
-- 検索結果がない場合は、別のキーワードで再検索を提案する
+- 検索結果がない・少ない場合は、キーワードを変えて search_books で再検索する
 - 本の情報は正確に伝える（タイトル、著者、出版年など）
 - Amazonリンクは提供しない（将来対応予定）
 """
 
+# 全リクエストで共有する固定部分（書き換えないこと）。
+# システムプロンプトとツール定義はどのラウンドでも同じものを先頭に送り、
+# OpenAI側のプロンプトキャッシュが効くようにする（最終回答でもツールは外さず tool_choice="none" にする）。
+CHAT_TOOLS = (SEARCH_BOOKS_TOOL,)
+STREAM_OPTIONS = {"include_usage": True}
+
+
+async def create_chat_stream(
+    client: AsyncOpenAI,
+    body: dict,
+    timeout: float,
+) -> AsyncStream[ChatCompletionChunk]:
+    """Chat Completionsをストリーミングで呼び出す（timeout は読み取り1回ごとの上限）"""
+    return await client.chat.completions.create(**body, timeout=timeout)
+
+
+async def execute_search_calls(
+    calls: list[dict],
+    cinii_client: httpx.AsyncClient,
+    concurrency: int,
+    candidate_pool: int = 0,
+    deadline: Optional[Deadline] = None,
+) -> list[BookSearchResponse | CiNiiAPIError]:
+    """search_booksのtool callを同時実行数の上限付きで並列実行する（結果は入力順）
+
+    candidate_pool が取得件数より大きい場合は、複数ページから候補を集めて
+    所蔵館数の多い順に取得件数分を選ぶ（CHAT_RANKING_ENABLED なら rank_books で採点・版違いをまとめて選ぶ）。
+    deadline までに終わらない検索はエラーとして返す。
+    BOOK_ENRICHMENT_ENABLED なら上位の本に件名・注記を補う（BOOK_ENRICHMENT_BUDGET 秒と deadline の短い方まで）。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    enricher = get_book_enricher()
+    prefetcher = get_search_prefetcher()
+    ranking = get_settings().chat_ranking_enabled
+
+    async def run(args: dict) -> BookSearchResponse | CiNiiAPIError:
+        async with semaphore:
+            try:
+                params = BookSearchParams(**args)
+            except ValidationError as e:
+                # LLMが不正な引数を渡しても、この呼び出しだけをエラーにして他の検索は続ける
+                return _invalid_arguments_error(e)
+            try:
+                if prefetcher is not None:
+                    prefetcher.record_search(params)
+                if candidate_pool > params.count:
+                    result = await search_books_deep(params, cinii_client, candidate_pool, deadline)
+                    if not ranking:
+                        books = sorted(result.books, key=lambda book: book.owner_count or 0, reverse=True)
+                        result = result.model_copy(update={"books": books[:params.count]})
+                else:
+                    result = await search_books(params, cinii_client, deadline=deadline)
+                if ranking:
+                    query = " ".join(filter(None, (params.query, params.title)))
+                    result = result.model_copy(update={"books": rank_books(result.books, query, params.count)})
+            except CiNiiAPIError as e:
+                return e
+        if enricher is not None and result.books:
+            budget = get_settings().book_enrichment_budget
+            if deadline is not None:
+                budget = min(budget, deadline.remaining())
+            result = result.model_copy(update={"books": await enricher.enrich(result.books, cinii_client, budget)})
+        return result
+
+    return await asyncio.gather(*(run(args) for args in calls))
+
+
+def _invalid_arguments_error(error: ValidationError) -> CiNiiAPIError:
+    details = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+    return CiNiiAPIError(f"Invalid search_books arguments: {details}", "invalid_input")
+
+
+ROUTED_CALL_ID = "call_routed_search"
+
+
+def _routed_search_message(intent: Intent) -> ChatCompletionMessage:
+    """意図判定で決めた検索を、モデルが要求したtool callと同じ形にする（以降のラウンドはそのまま続く）"""
+    return ChatCompletionMessage(
+        role="assistant",
+        content=None,
+        tool_calls=[
+            ChatCompletionMessageToolCall(
+                id=ROUTED_CALL_ID,
+                type="function",
+                function=Function(name="search_books", arguments=json.dumps(intent.params, ensure_ascii=False)),
+            )
+        ],
+    )
+
 
 async def process_chat_stream(
     message: str,
     history: list[ChatMessage],
+    cinii_client: httpx.AsyncClient,
+    openai_client: Optional[AsyncOpenAI],
+    deadline: Optional[Deadline] = None,
+    debug: Optional[bool] = None,
+    notes: Optional[str] = None,
 ) -> AsyncGenerator[dict, None]:
-    """チャットメッセージを処理し、各ステップをストリーミングで返す"""
+    """チャットメッセージを処理し、各ステップと回答テキストの差分（delta）をストリーミングで返す
+
+    検索するラウンドでもテキストは届いた順にdeltaで送り、そのラウンドがtool callで終わったら
+    （前置きの「検索してみます」などは回答ではないので）delta_reset を送ってクライアントに表示中のテキストを捨てさせる。
+
+    モデルは検索結果を見て再検索できる（ラウンド数・CiNii呼び出し回数・締め切りの範囲内）。
+    予算を使い切ったらツールなしで最終回答を生成させる。
+    deadline（省略時は CHAT_DEADLINE_SECONDS 後）の残り時間を各OpenAI・CiNii呼び出しのタイムアウトにする。
+    検索は最終回答用の時間を残して打ち切り、間に合わなければ検索結果なしで回答させる。
+    debug（省略時は CHAT_DEBUG_LOGS）がFalseならlogイベントを作らない。
+    notes はセッションに保存済みの要約などで、システムメッセージとして渡す。
+    CHAT_INTENT_ROUTING が有効なら、明示的な検索はLLMの検索判断を省いてCiNiiを直接検索し、
+    挨拶などはツールなしで回答させる。
+    CHAT_PREFETCH_ENABLED なら、done の後に最後の検索から次に聞かれそうな検索を裏で先読みする。
+    """
     settings = get_settings()
+    log = DebugLog(settings.chat_debug_logs if debug is None else debug)
+    if deadline is None:
+        deadline = Deadline.after(settings.chat_deadline_seconds)
+    search_deadline = deadline.reserve(settings.chat_answer_reserve_seconds)
 
-    if not settings.openai_api_key:
+    # openai_client はlifespanで作成した共有クライアント（APIキー未設定ならNone）
+    if openai_client is None:
         yield {"type": "error", "data": {"message": "OpenAI APIキーが設定されていません。"}}
         return
 
-    client = AsyncOpenAI(api_key=settings.openai_api_key)
-
-    # メッセージ履歴を構築
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for msg in history:
-        messages.append({"role": msg.role, "content": msg.content})
-    messages.append({"role": "user", "content": message})
-
-    # ログ: OpenAIリクエスト
-    yield {"type": "log", "data": create_log(
-        "openai_request",
-        "Backend → OpenAI: チャット補完リクエスト",
-        {"model": "gpt-4o-mini", "tools": ["search_books"], "message_count": len(messages)}
-    ).model_dump()}
-
-    try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            tools=[SEARCH_BOOKS_TOOL],
-            tool_choice="auto",
-        )
-    except AuthenticationError:
-        yield {"type": "log", "data": create_log("error", "OpenAI API 認証エラー").model_dump()}
-        yield {"type": "error", "data": {"message": "OpenAI APIキーが無効です。"}}
-        return
-    except APIError as e:
-        yield {"type": "log", "data": create_log("error", f"OpenAI API エラー: {e.message}").model_dump()}
-        yield {"type": "error", "data": {"message": f"OpenAI APIでエラーが発生しました: {e.message}"}}
-        return
+    # メッセージ履歴を構築（トークン予算を超える古いターンは要約メモに圧縮）
+    messages, history_stats = build_messages(
+        SYSTEM_PROMPT,
+        history,
+        message,
+        settings.chat_history_token_budget,
+        settings.chat_history_memo_chars,
+        notes=notes,
+    )
+    # 前のラウンドの検索結果は、次のラウンドでID/タイトルだけの参照に置き換える
+    compactable_results: list[tuple[dict, str]] = []
+
+    intent = classify_intent(message, history) if settings.chat_intent_routing else None
+    if intent is not None:
+        CHAT_INTENTS.inc(route=intent.route)
+        if log.enabled:
+            yield log.event(
+                "intent",
+                f"意図判定: {intent.route}",
+                {"route": intent.route, "reason": intent.reason, "params": intent.params},
+            )
+    # 直接検索する場合は、1ラウンド目のOpenAI呼び出しの代わりにこのtool callを使う
+    routed_message = _routed_search_message(intent) if intent is not None and intent.route == "search" else None
 
-    assistant_message = response.choices[0].message
     found_books = None
+    # 先読みの元にする最後の検索（パラメータと結果）
+    last_search: Optional[tuple[BookSearchParams, list[Book]]] = None
+    final_message = None
+    pending_results: list[tuple[dict, str]] = []
+    cinii_calls = 0
+    tool_call_count = 0
+    tools_timed_out = False
+
+    for round_index in range(settings.chat_max_rounds + 1):
+        round_number = round_index + 1
+        round_started = time.monotonic()
+        # ラウンド数・CiNii呼び出し回数・締め切りのいずれかを使い切ったらツールを渡さない
+        use_tools = (
+            round_index < settings.chat_max_rounds
+            and cinii_calls < settings.chat_max_cinii_calls
+            and not search_deadline.expired
+            and not tools_timed_out
+            # 雑談は検索させない。直接検索で本が見つかった後は要約だけさせる
+            and not (intent is not None and intent.route == "chat")
+            and not (intent is not None and intent.route == "search" and found_books)
+        )
 
-    # ログ: OpenAIレスポンス
-    has_tool_calls = bool(assistant_message.tool_calls)
-    yield {"type": "log", "data": create_log(
-        "openai_response",
-        f"OpenAI → Backend: レスポンス (tool_call: {'あり' if has_tool_calls else 'なし'})",
-        {"has_tool_calls": has_tool_calls, "finish_reason": response.choices[0].finish_reason}
-    ).model_dump()}
+        if round_index > 0:
+            # トークン数はログにしか使わないので、ログ無効時は数えない
+            prompt_tokens_before = count_message_tokens(messages) if log.enabled else 0
+            for tool_message, compact_content in compactable_results:
+                tool_message["content"] = compact_content
+            compactable_results = pending_results
+            if log.enabled:
+                history_stats = {
+                    "prompt_tokens_before": prompt_tokens_before,
+                    "prompt_tokens_after": count_message_tokens(messages),
+                }
 
-    # Tool callがある場合は実行
-    if assistant_message.tool_calls:
+        if routed_message is not None:
+            assistant_message, routed_message = routed_message, None
+            has_tool_calls = True
+        else:
+            model = settings.chat_model if use_tools else settings.chat_answer_model
+            # ログ: OpenAIリクエスト
+            if log.enabled:
+                request_details = {
+                    "model": model,
+                    "message_count": len(messages),
+                    "round": round_number,
+                    **history_stats,
+                }
+                if use_tools:
+                    request_details["tools"] = ["search_books"]
+                if round_index == 0:
+                    request_summary = "Backend → OpenAI: チャット補完リクエスト"
+                elif use_tools:
+                    request_summary = f"Backend → OpenAI: 検索結果を含めて再リクエスト（ラウンド{round_number}）"
+                else:
+                    request_summary = "Backend → OpenAI: 検索結果を含めて最終リクエスト"
+                yield log.event("openai_request", request_summary, request_details)
+
+            body = {
+                "model": model,
+                "messages": messages,
+                "tools": CHAT_TOOLS,
+                "tool_choice": "auto" if use_tools else "none",
+                "stream": True,
+                "stream_options": STREAM_OPTIONS,
+            }
+            # ツールありのラウンドは最終回答用の時間を残した締め切り、最終回答はリクエストの締め切りまで
+            stage_deadline = search_deadline if use_tools else deadline
+            completion = StreamedCompletion()
+            first_chunk_at = None
+            delta_sent = False
+            try:
+                # SDKのtimeoutは読み取り1回ごとの上限なので、接続とchunkの受信ごとに締め切りまでの残り時間で打ち切る
+                # （yieldをtimeoutの中に入れると、締め切り時に呼び出し側のTaskがキャンセルされるため受信だけを囲む）
+                async with asyncio.timeout(stage_deadline.remaining()):
+                    stream = await create_chat_stream(openai_client, body, stage_deadline.remaining())
+                async with stream:
+                    chunks = aiter(stream)
+                    while True:
+                        async with asyncio.timeout(stage_deadline.remaining()):
+                            chunk = await anext(chunks, None)
+                        if chunk is None:
+                            break
+                        if first_chunk_at is None:
+                            first_chunk_at = time.monotonic()
+                        text = completion.add(chunk)
+                        if text:
+                            delta_sent = True
+                            yield {"type": "delta", "data": {"content": text}}
+            # 受信途中の失敗はSDKの例外に変換されず、httpxの例外のまま届く
+            except (APITimeoutError, TimeoutError, httpx.TimeoutException):
+                if use_tools:
+                    # 検索の判断が締め切りまでに終わらなければ、ツールなしで回答させる
+                    if delta_sent:
+                        yield {"type": "delta_reset", "data": {}}
+                    if log.enabled:
+                        yield log.event(
+                            "error",
+                            "OpenAI API タイムアウト: 検索せずに回答を生成します",
+                            {"round": round_number},
+                        )
+                    tools_timed_out = True
+                    continue
+                if log.enabled:
+                    yield log.event("error", "OpenAI API タイムアウト")
+                yield {"type": "error", "data": {"message": "時間内に回答を生成できませんでした。もう一度お試しください。"}}
+                return
+            except AuthenticationError:
+                if log.enabled:
+                    yield log.event("error", "OpenAI API 認証エラー")
+                yield {"type": "error", "data": {"message": "OpenAI APIキーが無効です。"}}
+                return
+            except APIError as e:
+                if log.enabled:
+                    yield log.event("error", f"OpenAI API エラー: {e.message}")
+                yield {"type": "error", "data": {"message": f"OpenAI APIでエラーが発生しました: {e.message}"}}
+                return
+            except httpx.HTTPError as e:
+                # 受信途中の切断・プロトコルエラーなど（タイムアウト以外）
+                if log.enabled:
+                    yield log.event("error", f"OpenAI API 通信エラー: {type(e).__name__}: {e}")
+                yield {"type": "error", "data": {"message": "OpenAI APIとの通信中にエラーが発生しました。"}}
+                return
+
+            assistant_message = completion.message()
+            has_tool_calls = bool(assistant_message.tool_calls)
+            if has_tool_calls and delta_sent:
+                yield {"type": "delta_reset", "data": {}}
+            openai_elapsed = time.monotonic() - round_started
+            call_kind = "final" if not has_tool_calls else "first" if round_index == 0 else "followup"
+            OPENAI_REQUEST_SECONDS.observe(openai_elapsed, call=call_kind)
+            if first_chunk_at is not None:
+                OPENAI_FIRST_CHUNK_SECONDS.observe(first_chunk_at - round_started, call=call_kind)
+            usage = completion.usage
+            cached_tokens = None
+            if usage is not None:
+                OPENAI_TOKENS.observe(usage.prompt_tokens, kind="prompt")
+                OPENAI_TOKENS.observe(usage.completion_tokens, kind="completion")
+                if usage.prompt_tokens_details is not None and usage.prompt_tokens_details.cached_tokens is not None:
+                    cached_tokens = usage.prompt_tokens_details.cached_tokens
+                    OPENAI_TOKENS.observe(cached_tokens, kind="cached")
+
+            # ログ: OpenAIレスポンス
+            if log.enabled:
+                if round_index > 0 and not has_tool_calls:
+                    response_summary = "OpenAI → Backend: 最終回答を受信"
+                else:
+                    response_summary = f"OpenAI → Backend: レスポンス (tool_call: {'あり' if has_tool_calls else 'なし'})"
+                yield log.event(
+                    "openai_response",
+                    response_summary,
+                    {
+                        "has_tool_calls": has_tool_calls,
+                        "finish_reason": completion.finish_reason,
+                        "prompt_tokens": usage.prompt_tokens if usage is not None else None,
+                        "cached_tokens": cached_tokens,
+                        "round": round_number,
+                        "elapsed_ms": round(openai_elapsed * 1000),
+                    }
+                )
+
+        if not has_tool_calls:
+            final_message = assistant_message.content
+            break
+
+        # Tool callを実行
         tool_results = []
-
+        pending_results = []
+        search_calls = []
+        skipped_calls = []
+        invalid_calls = []
         for tool_call in assistant_message.tool_calls:
             if tool_call.function.name == "search_books":
-                args = json.loads(tool_call.function.arguments)
+                tool_call_count += 1
+                try:
+                    args = json.loads(tool_call.function.arguments)
+                except ValueError:
+                    args = None
+                if not isinstance(args, dict):
+                    # 引数がJSONのオブジェクトでなければ、この呼び出しだけをエラーとして返す
+                    if log.enabled:
+                        yield log.event(
+                            "error",
+                            "search_books の引数を解釈できません",
+                            {"arguments": tool_call.function.arguments},
+                        )
+                    invalid_calls.append(tool_call)
+                    continue
 
                 # ログ: Tool call検出
-                yield {"type": "log", "data": create_log(
-                    "tool_call",
-                    "OpenAI が search_books の実行を要求",
-                    {"arguments": args}
-                ).model_dump()}
-
-                # count上限を設定
-                if args.get("count", 10) > 20:
+                if log.enabled:
+                    yield log.event(
+                        "tool_call",
+                        "意図判定により search_books を直接実行" if tool_call.id == ROUTED_CALL_ID
+                        else "OpenAI が search_books の実行を要求",
+                        {"arguments": args}
+                    )
+
+                # CiNii呼び出し回数の上限を超えた分は実行しない
+                if cinii_calls + len(search_calls) >= settings.chat_max_cinii_calls:
+                    skipped_calls.append(tool_call)
+                    continue
+
+                # count上限を設定（数値でなければ検索時の検証でエラーにする）
+                if isinstance(args.get("count"), int) and args["count"] > 20:
                     args["count"] = 20
 
                 # ログ: CiNiiリクエスト
-                yield {"type": "log", "data": create_log(
-                    "cinii_request",
-                    "Backend → CiNii: 書籍検索リクエスト",
-                    {"params": args}
-                ).model_dump()}
-
-                try:
-                    params = BookSearchParams(**args)
-                    result = await search_books(params)
-                    found_books = [book.model_dump() for book in result.books]
+                if log.enabled:
+                    yield log.event(
+                        "cinii_request",
+                        "Backend → CiNii: 書籍検索リクエスト",
+                        {"params": args}
+                    )
+
+                search_calls.append((tool_call, args))
+
+        # 複数のsearch_booksは並列に実行し、結果は元のtool_call順で処理する
+        search_started = time.monotonic()
+        outcomes = await execute_search_calls(
+            [args for _, args in search_calls],
+            cinii_client,
+            settings.chat_tool_concurrency,
+            settings.chat_candidate_pool,
+            search_deadline,
+        )
+        search_elapsed_ms = round((time.monotonic() - search_started) * 1000)
+        cinii_calls += len(search_calls)
 
-                    # ログ: CiNiiレスポンス
-                    yield {"type": "log", "data": create_log(
-                        "cinii_response",
-                        f"CiNii → Backend: {result.total}件中{len(result.books)}件取得",
-                        {"total": result.total, "returned": len(result.books)}
-                    ).model_dump()}
-
-                    tool_result = json.dumps({
-                        "total": result.total,
-                        "books": found_books,
-                    }, ensure_ascii=False)
-                except CiNiiAPIError as e:
-                    yield {"type": "log", "data": create_log(
+        for (tool_call, args), outcome in zip(search_calls, outcomes):
+            if isinstance(outcome, CiNiiAPIError):
+                if log.enabled:
+                    yield log.event(
                         "error",
-                        f"CiNii API エラー: {e.message}",
-                        {"error_type": e.error_type}
-                    ).model_dump()}
-                    tool_result = json.dumps({
-                        "error": e.message,
-                        "error_type": e.error_type,
-                    }, ensure_ascii=False)
-
-                # ログ: Tool結果
-                yield {"type": "log", "data": create_log(
+                        f"CiNii API エラー: {outcome.message}",
+                        {"error_type": outcome.error_type}
+                    )
+                tool_result = json.dumps({
+                    "error": outcome.message,
+                    "error_type": outcome.error_type,
+                }, ensure_ascii=False)
+            else:
+                found_books = [book.model_dump() for book in outcome.books]
+                last_search = (BookSearchParams(**args), outcome.books)
+
+                # ログ: CiNiiレスポンス
+                if log.enabled:
+                    yield log.event(
+                        "cinii_response",
+                        f"CiNii → Backend: {outcome.total}件中{len(outcome.books)}件取得",
+                        {
+                            "total": outcome.total,
+                            "returned": len(outcome.books),
+                            "round": round_number,
+                            "elapsed_ms": search_elapsed_ms,
+                        }
+                    )
+
+                # LLMには設定した形式で圧縮して渡す（クライアントにはdoneで全項目を返す）
+                tool_result = encode_search_result(
+                    outcome.total, outcome.books, settings.chat_tool_result_format
+                )
+
+            # ログ: Tool結果
+            if log.enabled:
+                yield log.event(
                     "tool_result",
                     "Backend → OpenAI: 検索結果を送信",
                     {"tool_call_id": tool_call.id}
-                ).model_dump()}
-
-                tool_results.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "content": tool_result,
-                })
-
-        # Tool結果を含めて再度API呼び出し
+                )
+
+            tool_message = {
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "content": tool_result,
+            }
+            tool_results.append(tool_message)
+            if not isinstance(outcome, CiNiiAPIError):
+                pending_results.append((tool_message, compact_book_reference(outcome.total, found_books)))
+
+        for tool_call in invalid_calls:
+            tool_results.append({
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "content": json.dumps({
+                    "error": "引数がJSONのオブジェクトではないため実行しませんでした。",
+                    "error_type": "invalid_input",
+                }, ensure_ascii=False),
+            })
+
+        for tool_call in skipped_calls:
+            tool_results.append({
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "content": json.dumps({
+                    "error": "検索回数の上限に達したため実行しませんでした。これまでの結果で回答してください。",
+                    "error_type": "budget_exceeded",
+                }, ensure_ascii=False),
+            })
+
+        # Tool結果を含めて次のラウンドへ
         messages.append(assistant_message.model_dump())
         messages.extend(tool_results)
 
-        # ログ: 2回目のOpenAIリクエスト
-        yield {"type": "log", "data": create_log(
-            "openai_request",
-            "Backend → OpenAI: 検索結果を含めて最終リクエスト",
-            {"model": "gpt-4o-mini", "message_count": len(messages)}
-        ).model_dump()}
-
-        try:
-            final_response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-            )
-            final_message = final_response.choices[0].message.content
-
-            # ログ: 最終レスポンス
-            yield {"type": "log", "data": create_log(
-                "openai_response",
-                "OpenAI → Backend: 最終回答を受信",
-                {"finish_reason": final_response.choices[0].finish_reason}
-            ).model_dump()}
-        except APIError as e:
-            yield {"type": "log", "data": create_log("error", f"OpenAI API エラー: {e.message}").model_dump()}
-            yield {"type": "error", "data": {"message": f"OpenAI APIでエラーが発生しました: {e.message}"}}
-            return
-    else:
-        final_message = assistant_message.content
+    CHAT_TOOL_CALLS.observe(tool_call_count)
 
     # 最終結果を送信
     yield {"type": "done", "data": {
@@ -244,18 +582,73 @@ async def process_chat_stream(
         "books": found_books,
     }}
 
+    prefetcher = get_search_prefetcher()
+    if prefetcher is not None and last_search is not None:
+        prefetcher.schedule(followup_searches(*last_search, settings.chat_prefetch_max_queries), cinii_client)
+
+
+async def cached_chat_stream(
+    message: str,
+    history: list[ChatMessage],
+    cinii_client: httpx.AsyncClient,
+    openai_client: Optional[AsyncOpenAI],
+    deadline: Optional[Deadline] = None,
+    debug: Optional[bool] = None,
+    notes: Optional[str] = None,
+) -> AsyncGenerator[dict, None]:
+    """応答キャッシュを通して process_chat_stream を呼ぶ
+
+    同じ・よく似た質問への回答がキャッシュにあれば、検索もLLM呼び出しもせずに
+    保存済みのdone（booksを含む）を返す。本文はdelta 1回でまとめて送る。
+    セッションのメモ（notes）が違う場合は同じ質問でも使い回さない。
+    """
+    cache = get_response_cache()
+    if cache is None:
+        async for event in process_chat_stream(message, history, cinii_client, openai_client, deadline, debug, notes):
+            yield event
+        return
+
+    cached = cache.lookup(message, history, notes)
+    if cached is not None:
+        log = DebugLog(get_settings().chat_debug_logs if debug is None else debug)
+        if log.enabled:
+            yield log.event(
+                "response_cache",
+                "応答キャッシュから回答を返却",
+                {
+                    "match": cached.match,
+                    "score": round(cached.score, 3),
+                    "saved_ms": round(cached.latency * 1000),
+                },
+            )
+        yield {"type": "delta", "data": {"content": cached.payload["message"]}}
+        yield {"type": "done", "data": cached.payload}
+        return
+
+    started = time.monotonic()
+    async for event in process_chat_stream(message, history, cinii_client, openai_client, deadline, debug, notes):
+        # 検索結果付きで回答できたターンだけを保存する（エラーや検索失敗時の回答は使い回さない）
+        if event["type"] == "done" and event["data"]["books"]:
+            cache.store(message, history, event["data"], time.monotonic() - started, notes)
+        yield event
+
 
 # 従来の非ストリーミング版も残す（互換性のため）
 async def process_chat(
     message: str,
     history: list[ChatMessage],
+    cinii_client: httpx.AsyncClient,
+    openai_client: Optional[AsyncOpenAI],
+    deadline: Optional[Deadline] = None,
+    debug: Optional[bool] = None,
+    notes: Optional[str] = None,
 ) -> ChatResponse:
     """チャットメッセージを処理し、必要に応じて本を検索して推薦する"""
     debug_logs = []
     result_message = ""
     result_books = None
 
-    async for event in process_chat_stream(message, history):
+    async for event in cached_chat_stream(message, history, cinii_client, openai_client, deadline, debug, notes):
         if event["type"] == "log":
             debug_logs.append(DebugLogEntry(**event["data"]))
         elif event["type"] == "done":
@@ -267,5 +660,5 @@ async def process_chat(
     return ChatResponse(
         message=result_message,
         books=result_books,
-        debug_logs=debug_logs,
+        debug_logs=debug_logs or None,
     )
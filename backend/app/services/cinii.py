@@ -1,30 +1,207 @@
+import asyncio
+import math
+import re
+import time
 import httpx
-from typing import Optional
-from app.schemas.book import Book, BookSearchParams, BookSearchResponse
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from app.schemas.book import MAX_SEARCH_COUNT, Book, BookSearchParams, BookSearchResponse
 from app.config import get_settings
+from app.services.book_index import get_book_index
+from app.services.deadline import Deadline
+from app.services.json_backend import loads
+from app.services.metrics import CINII_ERRORS, CINII_PARSE_SECONDS, CINII_REQUEST_SECONDS
+from app.services.ranking import prepare_books
+from app.services.resilience import (
+    backoff_delay,
+    get_circuit_breaker,
+    get_latency_tracker,
+    get_rate_limiter,
+    parse_retry_after,
+)
+from app.services.search_cache import get_search_cache, make_search_key
 
 CINII_BOOKS_API_URL = "https://ci.nii.ac.jp/books/opensearch/search"
+_ISBN_RE = re.compile(r"urn:isbn:(.+)", re.IGNORECASE)
+
+
+# クライアント側で再試行してよいエラー種別
+RETRYABLE_ERROR_TYPES = frozenset({"timeout", "rate_limit", "connection_error"})
 
 
 class CiNiiAPIError(Exception):
     """CiNii API関連のエラー"""
-    def __init__(self, message: str, error_type: str = "api_error"):
+    def __init__(
+        self,
+        message: str,
+        error_type: str = "api_error",
+        retry_after: Optional[float] = None,
+        status_code: Optional[int] = None,
+    ):
         self.message = message
         self.error_type = error_type
+        self.retry_after = retry_after  # 429のRetry-After（秒）
+        self.status_code = status_code  # CiNiiが返したHTTPステータス
         super().__init__(self.message)
 
 
-async def search_books(params: BookSearchParams) -> BookSearchResponse:
-    """CiNii Books APIで書籍を検索する"""
+class SingleFlight:
+    """同一キーの同時リクエストを1本の上流呼び出しにまとめる
+
+    上流呼び出しは独立したTaskで実行し、各呼び出し元はshieldして待つため、
+    1つのクライアントが切断（キャンセル）しても他の待機者には影響しない。
+    上流呼び出しには呼び出し元のうち最も遅い締め切りを渡す（締め切りなしの呼び出し元がいれば無期限）。
+    後から加わった呼び出し元の締め切りの方が遅ければ延長する。
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._deadlines: dict[str, Deadline] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[Deadline], Awaitable[BookSearchResponse]],
+        deadline: Optional[Deadline] = None,
+    ) -> BookSearchResponse:
+        expires_at = deadline.expires_at if deadline is not None else math.inf
+        task = self._inflight.get(key)
+        if task is None:
+            shared = Deadline(expires_at)
+            task = asyncio.create_task(fn(shared))
+            self._inflight[key] = task
+            self._deadlines[key] = shared
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.stats["leaders"] += 1
+        else:
+            shared = self._deadlines[key]
+            shared.expires_at = max(shared.expires_at, expires_at)
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict:
+        """監視用の統計情報"""
+        return {**self.stats, "inflight": len(self._inflight)}
+
+    async def aclose(self) -> None:
+        """実行中の上流呼び出しを止める（アプリの終了時、HTTPクライアントを閉じる前に呼ぶ）"""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._deadlines[key]
+        # 待機者が全員キャンセルした場合でも例外を回収して警告を出さない
+        if not task.cancelled():
+            task.exception()
+
+
+search_flight = SingleFlight()
+
+
+async def search_books(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    use_local_index: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> BookSearchResponse:
+    """CiNii Books APIで書籍を検索する（clientはアプリ共有のプール済みクライアント）
+
+    同じ正規化パラメータの検索は検索キャッシュから返す。
+    BOOK_INDEX_MODE=local_first ならローカル索引で足りる検索（1ページ目のみ）はCiNiiに問い合わせない。
+    deadline を過ぎても結果がなければ error_type="timeout" で打ち切る。
+    """
+    try:
+        return await _search_books(params, client, use_local_index, deadline)
+    except CiNiiAPIError as e:
+        # 再試行で回復したエラーや内部の制御用のエラーは数えず、呼び出し元に返すものだけを数える
+        CINII_ERRORS.inc(error_type=e.error_type)
+        raise
+
+
+async def _search_books(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    use_local_index: bool,
+    deadline: Optional[Deadline],
+) -> BookSearchResponse:
     settings = get_settings()
 
     if not settings.cinii_app_id:
         raise CiNiiAPIError("CiNii APP ID is not configured", "config_error")
 
+    # クエリが空の場合はエラー
+    search_fields = [params.query, params.title, params.author, params.publisher]
+    if not any(search_fields):
+        raise CiNiiAPIError(
+            "At least one search parameter (query, title, author, publisher) is required",
+            "invalid_input"
+        )
+
+    key = make_search_key(params)
+    cache = get_search_cache()
+    index = get_book_index()
+
+    async def fetch_and_store(fetch_deadline: Deadline) -> BookSearchResponse:
+        result = await _fetch_books(params, client, fetch_deadline)
+        if index is not None:
+            index.upsert(result.books)
+        if cache is not None:
+            await cache.set(key, result)
+        return result
+
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            if cached.stale:
+                # 裏の再取得はこのリクエストの締め切りに縛られない
+                cache.schedule_refresh(key, lambda: search_flight.do(key, fetch_and_store))
+            return cached.value
+
+    if use_local_index and params.page == 1 and index is not None and settings.book_index_mode == "local_first":
+        local = index.search(params, settings.book_index_max_age, settings.book_index_min_hits)
+        if local is not None:
+            return local
+
+    try:
+        if deadline is None:
+            return await search_flight.do(key, fetch_and_store)
+        # 集約先の上流呼び出しはshieldされているので、ここで待つのをやめても他の待機者には影響しない
+        try:
+            return await asyncio.wait_for(search_flight.do(key, fetch_and_store, deadline), deadline.remaining())
+        except asyncio.TimeoutError:
+            raise CiNiiAPIError("CiNii search exceeded the request deadline", "timeout")
+    except CiNiiAPIError as e:
+        if e.error_type != "circuit_open":
+            raise
+        # ブレーカーがopenの間は、期限切れでも残っているキャッシュや索引から返す
+        if cache is not None:
+            fallback = await cache.get_fallback(key)
+            if fallback is not None:
+                return fallback
+        if use_local_index and params.page == 1 and index is not None:
+            local = index.search(params, min_hits=1)
+            if local is not None:
+                return local
+        raise
+
+
+async def _fetch_books(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    deadline: Optional[Deadline] = None,
+) -> BookSearchResponse:
+    """CiNii Books APIを実際に呼び出す"""
+    settings = get_settings()
+
     query_params = {
         "format": "json",
         "appid": settings.cinii_app_id,
-        "count": params.count,
+        "count": max(1, min(params.count, MAX_SEARCH_COUNT)),
     }
 
     if params.query:
@@ -39,30 +216,17 @@ async def search_books(params: BookSearchParams) -> BookSearchResponse:
         query_params["year_from"] = params.year_from
     if params.year_to:
         query_params["year_to"] = params.year_to
+    if params.page > 1:
+        query_params["p"] = params.page
 
-    # クエリが空の場合はエラー
-    search_fields = [params.query, params.title, params.author, params.publisher]
-    if not any(search_fields):
-        raise CiNiiAPIError(
-            "At least one search parameter (query, title, author, publisher) is required",
-            "invalid_input"
-        )
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(CINII_BOOKS_API_URL, params=query_params)
-            response.raise_for_status()
-        except httpx.TimeoutException:
-            raise CiNiiAPIError("CiNii API request timed out", "timeout")
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                raise CiNiiAPIError("Rate limit exceeded", "rate_limit")
-            raise CiNiiAPIError(f"CiNii API returned error: {e.response.status_code}", "api_error")
-        except httpx.RequestError as e:
-            raise CiNiiAPIError(f"Failed to connect to CiNii API: {str(e)}", "connection_error")
-
-    data = response.json()
+    response = await _get_with_retries(client, query_params, deadline)
+    parse_started = time.perf_counter()
+    data = loads(response.content)
     books = _parse_cinii_response(data)
+    CINII_PARSE_SECONDS.observe(time.perf_counter() - parse_started)
+    if settings.chat_ranking_enabled:
+        # 再ランキングで使うタイトル・著者の正規化はパース時に1回だけ行う
+        prepare_books(books)
 
     # 使用したクエリ情報（デバッグ/透明性用）
     query_used = {k: v for k, v in query_params.items() if k not in ["format", "appid"]}
@@ -74,76 +238,351 @@ async def search_books(params: BookSearchParams) -> BookSearchResponse:
     )
 
 
+async def _get_with_retries(
+    client: httpx.AsyncClient,
+    query_params: dict,
+    deadline: Optional[Deadline] = None,
+) -> httpx.Response:
+    """レートリミッター・サーキットブレーカーを通してCiNiiにGETする
+
+    再試行可能なエラー（RETRYABLE_ERROR_TYPES）はジッター付きバックオフで再試行する。
+    deadline があれば各試行のタイムアウトを残り時間に縮め、間に合わない再試行はしない
+    （single-flightで後から遅い締め切りの呼び出し元が加わると、deadline は途中で延びる）。
+    """
+    settings = get_settings()
+    limiter = get_rate_limiter()
+    breaker = get_circuit_breaker()
+
+    def attempt_timeout() -> Optional[float]:
+        return deadline.timeout(settings.cinii_read_timeout) if deadline is not None else None
+
+    attempt = 0
+    while True:
+        if deadline is not None and deadline.expired:
+            raise CiNiiAPIError("CiNii search exceeded the request deadline", "timeout")
+        if not breaker.allow():
+            raise CiNiiAPIError("CiNii API is temporarily unavailable (circuit open)", "circuit_open")
+        # 締め切りで縮めたタイムアウトで打ち切られても、CiNiiの障害としては数えない
+        shortened = deadline is not None and deadline.remaining() < settings.cinii_read_timeout
+        try:
+            if not await limiter.acquire(deadline.remaining() if deadline is not None else None):
+                raise CiNiiAPIError("CiNii rate limit wait exceeds the request deadline", "deadline_exceeded")
+            if settings.cinii_hedge_enabled:
+                response = await _hedged_get(client, query_params, attempt_timeout)
+            else:
+                response = await _get(client, query_params, attempt_timeout())
+        except CiNiiAPIError as e:
+            if e.error_type == "rate_limit":
+                limiter.on_rate_limited(e.retry_after)
+            deadline_hit = deadline is not None and deadline.expired
+            # タイムアウト・接続エラー・5xxを障害として数える
+            # （429はレートリミッター側で扱い、その他の4xxはCiNiiが応答しているので成功扱い）
+            if (
+                deadline_hit
+                or (shortened and e.error_type == "timeout")
+                or e.error_type in ("rate_limit", "deadline_exceeded")
+            ):
+                breaker.release_probe()
+            elif e.error_type in ("timeout", "connection_error") or (e.status_code or 0) >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if deadline_hit or e.error_type not in RETRYABLE_ERROR_TYPES or attempt >= settings.cinii_max_retries:
+                raise
+            delay = backoff_delay(
+                attempt,
+                settings.cinii_retry_base_delay,
+                settings.cinii_retry_max_delay,
+                e.retry_after,
+            )
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            breaker.release_probe()
+            raise
+        limiter.on_success()
+        breaker.record_success()
+        return response
+
+
+async def _hedged_get(
+    client: httpx.AsyncClient,
+    query_params: dict,
+    attempt_timeout: Callable[[], Optional[float]],
+) -> httpx.Response:
+    """直近のp95を過ぎても応答がなければ同じGETをもう1本送り、先に成功した方を返す
+
+    ヘッジ分もレートリミッターのトークンを使う（すぐに取れないときは送らない）。
+    """
+    settings = get_settings()
+    tracker = get_latency_tracker()
+    delay = tracker.hedge_delay(settings.cinii_hedge_min_delay)
+    primary = asyncio.create_task(_get(client, query_params, attempt_timeout()))
+    pending = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+        if delay is None or done or not get_rate_limiter().try_acquire():
+            return await primary
+
+        hedge = asyncio.create_task(_get(client, query_params, attempt_timeout()))
+        pending.add(hedge)
+        tracker.stats["hedged"] += 1
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        tracker.stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _get(client: httpx.AsyncClient, query_params: dict, timeout: Optional[float] = None) -> httpx.Response:
+    """CiNiiに1回GETし、失敗をCiNiiAPIErrorに分類する（timeout指定時はクライアント既定より優先）"""
+    started = time.monotonic()
+    try:
+        response = await _send(client, query_params, timeout)
+    except CiNiiAPIError as e:
+        CINII_REQUEST_SECONDS.observe(
+            time.monotonic() - started, status=e.status_code or "", error_type=e.error_type
+        )
+        raise
+    elapsed = time.monotonic() - started
+    CINII_REQUEST_SECONDS.observe(elapsed, status=response.status_code, error_type="")
+    get_latency_tracker().record(elapsed)
+    return response
+
+
+async def _send(client: httpx.AsyncClient, query_params: dict, timeout: Optional[float]) -> httpx.Response:
+    try:
+        response = await client.get(
+            get_settings().cinii_api_url or CINII_BOOKS_API_URL,
+            params=query_params,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+        response.raise_for_status()
+    except httpx.TimeoutException:
+        raise CiNiiAPIError("CiNii API request timed out", "timeout")
+    except httpx.HTTPStatusError as e:
+        status_code = e.response.status_code
+        if status_code == 429:
+            retry_after = parse_retry_after(e.response.headers.get("retry-after"))
+            raise CiNiiAPIError("Rate limit exceeded", "rate_limit", retry_after, status_code)
+        raise CiNiiAPIError(f"CiNii API returned error: {status_code}", "api_error", status_code=status_code)
+    except httpx.RequestError as e:
+        raise CiNiiAPIError(f"Failed to connect to CiNii API: {str(e)}", "connection_error")
+    return response
+
+
+async def iter_search_pages(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    limit: int,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[BookSearchResponse]:
+    """複数ページを並列に取得し、CiNiiの順位順に1ページずつ返す
+
+    1ページ目で総件数を確認してから、残りのページを呼び出し元が読み進めるのに合わせて
+    最大 CINII_PAGE_CONCURRENCY ページ先まで先に取得する（取得済みで未読のページはその分しか持たない）。
+    既出の本（ID重複）は取り除く。
+    ページ単位の検索はsearch_booksを通すため、キャッシュと同一検索の集約が効く。
+    2ページ目以降の取得に失敗したら、そこまでの結果で打ち切る（1ページ目の失敗だけ例外にする）。
+    """
+    settings = get_settings()
+    limit = max(1, min(limit, settings.cinii_deep_max_results))
+    page_size = max(1, min(settings.cinii_page_size, MAX_SEARCH_COUNT))
+    # limit を含めると /books/search や他の limit の検索とキャッシュキーが分かれるので除く
+    base = BookSearchParams(**{**params.model_dump(exclude={"limit"}), "count": page_size, "page": 1})
+    window = max(1, settings.cinii_page_concurrency)
+
+    async def fetch_page(page: int) -> BookSearchResponse:
+        return await search_books(
+            base.model_copy(update={"page": page}), client, use_local_index=False, deadline=deadline
+        )
+
+    first = await fetch_page(1)
+    seen: set[str] = set()
+    remaining = limit
+
+    def take(page: BookSearchResponse) -> BookSearchResponse:
+        nonlocal remaining
+        books = []
+        for book in page.books:
+            if book.id in seen or remaining <= 0:
+                continue
+            seen.add(book.id)
+            books.append(book)
+            remaining -= 1
+        return page.model_copy(update={"books": books})
+
+    page_numbers = iter(range(2, math.ceil(min(limit, first.total) / page_size) + 1))
+    tasks: deque[asyncio.Task] = deque()
+
+    def fill() -> None:
+        """呼び出し元が読んでいる位置から window ページ先まで取得を始める"""
+        while len(tasks) < window:
+            page = next(page_numbers, None)
+            if page is None:
+                return
+            tasks.append(asyncio.create_task(fetch_page(page)))
+
+    try:
+        fill()
+        yield take(first)
+        while tasks and remaining > 0:
+            try:
+                page = await tasks.popleft()
+            except CiNiiAPIError:
+                break
+            if not page.books:
+                break
+            fill()
+            yield take(page)
+    finally:
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                task.exception()  # 使わなかったページの失敗は捨てる
+            task.cancel()
+
+
+async def iter_books_deep(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    limit: int,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[Book | BookSearchResponse]:
+    """複数ページの検索結果を1冊ずつ返し、最後に総件数と使用クエリのみのレスポンスを返す
+
+    保持するのは取得中のページ分だけなので、件数が多くても結果全体をメモリに載せない。
+    """
+    total = 0
+    query_used: dict = {}
+    pages = 0
+    async for page in iter_search_pages(params, client, limit, deadline):
+        if pages == 0:
+            total = page.total
+            query_used = {k: v for k, v in page.query_used.items() if k != "p"}
+        pages += 1
+        for book in page.books:
+            yield book
+    yield BookSearchResponse(
+        total=total,
+        books=[],
+        query_used={**query_used, "pages": pages, "limit": limit},
+    )
+
+
+async def search_books_deep(
+    params: BookSearchParams,
+    client: httpx.AsyncClient,
+    limit: int,
+    deadline: Optional[Deadline] = None,
+) -> BookSearchResponse:
+    """複数ページにまたがってlimit件まで取得する（順位順・重複除去済み）"""
+    books: list[Book] = []
+    async for item in iter_books_deep(params, client, limit, deadline):
+        if isinstance(item, Book):
+            books.append(item)
+        else:
+            return item.model_copy(update={"books": books})
+
+
 def _parse_cinii_response(data: dict) -> list[Book]:
-    """CiNii JSON-LDレスポンスをBook型に変換する"""
-    books = []
+    """CiNii JSON-LDレスポンスをBook型に変換する
 
+    抽出済みのdictは model_validate で組み立てる（Book(**fields) よりキーワード引数の展開がない分速い）。
+    """
     graph = data.get("@graph", [])
     if not graph:
-        return books
+        return []
 
     # @graph[0].items に書籍データが入っている
     channel = graph[0] if graph else {}
     items = channel.get("items", [])
 
+    books = []
     for item in items:
-        # タイトル取得（"title" または "dc:title"）
-        title = item.get("title") or _get_value(item, "dc:title")
-        if not title:
-            continue
+        fields = _extract_book_fields(item)
+        if fields is not None:
+            books.append(Book.model_validate(fields))
+    return books
 
-        # 著者取得
-        creators = item.get("dc:creator", [])
-        if isinstance(creators, str):
-            creators = [creators]
-        elif isinstance(creators, list):
-            creators = [_get_value(c) if isinstance(c, dict) else c for c in creators]
-        else:
-            creators = []
 
-        # 出版社取得
-        publishers = item.get("dc:publisher", [])
-        if isinstance(publishers, list):
-            publisher = publishers[0] if publishers else None
-        else:
-            publisher = publishers
-
-        # 出版年取得
-        year = item.get("prism:publicationDate") or item.get("dc:date")
-
-        # ISBN取得
-        isbn = None
-        identifiers = item.get("dcterms:hasPart", [])
-        if isinstance(identifiers, dict):
-            identifiers = [identifiers]
-        for ident in identifiers:
-            ident_value = ident.get("@id", "")
-            if "urn:isbn:" in ident_value.lower():
-                isbn = ident_value.replace("urn:isbn:", "").replace("URN:ISBN:", "")
-                break
+def _extract_book_fields(item: dict) -> Optional[dict]:
+    """1アイテムからBookの各項目を取り出す（タイトルがなければNone）"""
+    # タイトル取得（"title" または "dc:title"）
+    title = item.get("title") or _get_value(item, "dc:title")
+    if not title:
+        return None
 
-        # 所蔵館数（文字列で返ってくるのでintに変換）
-        owner_count_raw = item.get("cinii:ownerCount")
-        owner_count = int(owner_count_raw) if owner_count_raw else None
+    # 著者取得
+    creators = item.get("dc:creator")
+    if isinstance(creators, str):
+        authors = [creators]
+    elif isinstance(creators, list):
+        authors = [_as_text(c) for c in creators]
+        authors = [a for a in authors if a]
+    else:
+        authors = []
 
-        # CiNii URL
-        cinii_url = item.get("@id", "")
+    # 出版社取得
+    publishers = item.get("dc:publisher")
+    if isinstance(publishers, list):
+        publisher = _as_text(publishers[0]) if publishers else None
+    else:
+        publisher = _as_text(publishers)
 
-        # ID抽出
-        book_id = cinii_url.split("/")[-1] if cinii_url else ""
+    # 出版年取得
+    year = item.get("prism:publicationDate") or item.get("dc:date")
 
-        books.append(Book(
-            id=book_id,
-            title=title,
-            authors=creators,
-            publisher=publisher,
-            year=year,
-            isbn=isbn,
-            owner_count=owner_count,
-            cinii_url=cinii_url,
-        ))
+    # ISBN取得
+    isbn = None
+    identifiers = item.get("dcterms:hasPart")
+    if isinstance(identifiers, dict):
+        identifiers = (identifiers,)
+    for ident in identifiers or ():
+        match = _ISBN_RE.search(ident.get("@id", ""))
+        if match:
+            isbn = match.group(1)
+            break
 
-    return books
+    # 所蔵館数（文字列で返ってくるのでintに変換）
+    owner_count_raw = item.get("cinii:ownerCount")
+    owner_count = int(owner_count_raw) if owner_count_raw else None
+
+    # CiNii URL
+    cinii_url = item.get("@id", "")
+
+    return {
+        "id": cinii_url.rpartition("/")[2],  # ID抽出
+        "title": _as_text(title),
+        "authors": authors,
+        "publisher": publisher,
+        "year": _as_text(year),
+        "isbn": isbn,
+        "description": None,
+        "subjects": None,
+        "owner_count": owner_count,
+        "cinii_url": cinii_url,
+    }
+
+
+def _as_text(value) -> Optional[str]:
+    """JSON-LDの値を文字列にする（{"@value": ...} 形式にも対応）"""
+    if isinstance(value, dict):
+        value = value.get("@value")
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
 
 
 def _get_value(item: dict, key: str) -> Optional[str]:
@@ -0,0 +1,32 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """リクエスト全体の締め切り（time.monotonic基準）
+
+    各段階は remaining() で残り時間を受け取り、タイムアウトに使う。
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """後段のために seconds 秒を残した、手前の段階用の締め切り"""
+        return Deadline(self.expires_at - seconds)
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """残り時間（capがあればそれ以下）"""
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+import httpx
+from app.config import get_settings
+from app.schemas.book import Book
+from app.services.json_backend import loads
+from app.services.resilience import get_circuit_breaker, get_rate_limiter, parse_retry_after
+
+CINII_RECORD_BASE_URL = "https://ci.nii.ac.jp/ncid/"
+DESCRIPTION_MAX_CHARS = 300
+
+# レコード（JSON-LD）のうち件名・注記として使うキー
+_SUBJECT_KEYS = ("dc:subject", "dcterms:subject", "foaf:topic")
+_NOTE_KEYS = ("dc:description", "dcterms:description", "dcterms:abstract", "dcterms:tableOfContents", "cinii:note")
+
+
+@dataclass
+class BookDetails:
+    """CiNiiのレコードから取り出した、検索結果にない書誌詳細"""
+
+    subjects: list[str] = field(default_factory=list)
+    description: Optional[str] = None
+
+
+def extract_record_details(data: dict) -> BookDetails:
+    """CiNii Booksのレコード（/ncid/{id}.json）から件名と注記を取り出す"""
+    graph = data.get("@graph")
+    entity = graph[0] if isinstance(graph, list) and graph else data
+    subjects: list[str] = []
+    for key in _SUBJECT_KEYS:
+        for text in _texts(entity.get(key)):
+            if text not in subjects:
+                subjects.append(text)
+    notes = [text for key in _NOTE_KEYS for text in _texts(entity.get(key))]
+    description = " / ".join(notes)[:DESCRIPTION_MAX_CHARS] or None
+    return BookDetails(subjects=subjects, description=description)
+
+
+def _texts(value) -> list[str]:
+    """JSON-LDの値（文字列・{"@value"}・{"dc:title"}・それらのリスト）を文字列のリストにする"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [text for item in value for text in _texts(item)]
+    if isinstance(value, dict):
+        value = value.get("@value") or value.get("dc:title") or value.get("rdfs:label")
+        return _texts(value)
+    text = " ".join(str(value).split())
+    return [text] if text else []
+
+
+class BookDetailCache:
+    """書誌詳細の永続キャッシュ（SQLite。CiNii IDで引き、なければISBNで引く）
+
+    書誌レコードはほとんど変わらないのでTTLは長くする。詳細がなかった本も空の値で保存し、再取得しない。
+    """
+
+    def __init__(self, path: str, ttl: float):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS book_details "
+            "(id TEXT PRIMARY KEY, isbn TEXT, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS book_details_isbn ON book_details(isbn)")
+        self._conn.commit()
+
+    def get_many(self, books: Iterable[Book]) -> dict[str, BookDetails]:
+        """期限内の詳細を本のIDごとに返す"""
+        books = list(books)
+        if not books:
+            return {}
+        since = time.time() - self.ttl
+        ids = [book.id for book in books]
+        isbns = [book.isbn for book in books if book.isbn]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, isbn, data FROM book_details WHERE fetched_at > ? "
+                f"AND (id IN ({','.join('?' * len(ids))}) OR isbn IN ({','.join('?' * len(isbns))}))",
+                (since, *ids, *isbns),
+            ).fetchall()
+        by_id = {row[0]: row[2] for row in rows}
+        by_isbn = {row[1]: row[2] for row in rows if row[1]}
+        found = {}
+        for book in books:
+            data = by_id.get(book.id) or (by_isbn.get(book.isbn) if book.isbn else None)
+            if data is not None:
+                found[book.id] = BookDetails(**json.loads(data))
+        return found
+
+    def put(self, book: Book, details: BookDetails) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO book_details (id, isbn, data, fetched_at) VALUES (?, ?, ?, ?)",
+                (book.id, book.isbn, json.dumps(asdict(details), ensure_ascii=False), time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class BookEnricher:
+    """検索結果の上位の本に、CiNiiのレコードから件名・注記を補う
+
+    未キャッシュの本は同時実行数の上限付きで並列に取得し、budget 秒を過ぎたら待たずに返す。
+    間に合わなかった取得は裏で続けてキャッシュに入れるので、次に同じ本が出たときに使える。
+    """
+
+    def __init__(self, cache: BookDetailCache, top_n: int = 5, concurrency: int = 4, timeout: float = 5.0):
+        self.cache = cache
+        self.top_n = top_n
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        # 同じ本の取得は1本にまとめる（間に合わなかった取得もここで参照を持ち続ける）
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.stats = {"cache_hits": 0, "fetched": 0, "fetch_errors": 0, "skipped": 0, "late": 0}
+
+    async def enrich(self, books: list[Book], client: httpx.AsyncClient, budget: float) -> list[Book]:
+        targets = books[:self.top_n]
+        details = self.cache.get_many(targets)
+        self.stats["cache_hits"] += len(details)
+        missing = [book for book in targets if book.id not in details]
+        if missing and budget > 0:
+            tasks = {book.id: self._fetch_once(book, client) for book in missing}
+            done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+            self.stats["late"] += len(pending)
+            for book_id, task in tasks.items():
+                if task in done and not task.cancelled() and task.exception() is None and task.result() is not None:
+                    details[book_id] = task.result()
+        if not details:
+            return books
+        return [_apply(book, details.get(book.id)) for book in books]
+
+    def snapshot(self) -> dict:
+        """監視用の統計情報"""
+        return {**self.stats, "inflight": len(self._inflight)}
+
+    async def aclose(self) -> None:
+        """裏で続いている取得を止める（キャッシュを閉じる前に呼ぶ）"""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _fetch_once(self, book: Book, client: httpx.AsyncClient) -> asyncio.Task:
+        task = self._inflight.get(book.id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(book, client))
+            self._inflight[book.id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(book.id, None))
+        return task
+
+    async def _fetch(self, book: Book, client: httpx.AsyncClient) -> Optional[BookDetails]:
+        """1件取得してキャッシュに保存する（補完は任意なので失敗はNoneにする）"""
+        async with self._semaphore:
+            # 検索と同じレートリミッターに従い、CiNiiの障害中は取りに行かない
+            if get_circuit_breaker().state == "open" or not await get_rate_limiter().acquire(max_wait=self.timeout):
+                self.stats["skipped"] += 1
+                return None
+            settings = get_settings()
+            url = f"{settings.cinii_record_base_url or CINII_RECORD_BASE_URL}{book.id}.json"
+            try:
+                response = await client.get(url, params={"appid": settings.cinii_app_id}, timeout=self.timeout)
+            except httpx.HTTPError:
+                self.stats["fetch_errors"] += 1
+                return None
+            if response.status_code == 429:
+                get_rate_limiter().on_rate_limited(parse_retry_after(response.headers.get("retry-after")))
+                self.stats["fetch_errors"] += 1
+                return None
+            if response.status_code == 404:
+                details = BookDetails()
+            elif response.status_code != 200:
+                self.stats["fetch_errors"] += 1
+                return None
+            else:
+                try:
+                    details = extract_record_details(loads(response.content))
+                except (ValueError, AttributeError):
+                    self.stats["fetch_errors"] += 1
+                    return None
+            self.cache.put(book, details)
+            self.stats["fetched"] += 1
+            return details
+
+
+def _apply(book: Book, details: Optional[BookDetails]) -> Book:
+    if details is None or (not details.subjects and not details.description):
+        return book
+    return book.model_copy(update={
+        "subjects": details.subjects or book.subjects,
+        "description": details.description or book.description,
+    })
+
+
+@lru_cache
+def get_book_enricher() -> Optional[BookEnricher]:
+    """設定に基づいてアプリ共有の書誌詳細の補完を返す（無効ならNone）"""
+    settings = get_settings()
+    if not settings.book_enrichment_enabled:
+        return None
+    return BookEnricher(
+        BookDetailCache(settings.book_enrichment_cache_path, settings.book_enrichment_cache_ttl),
+        top_n=settings.book_enrichment_top_n,
+        concurrency=settings.book_enrichment_concurrency,
+        timeout=settings.book_enrichment_timeout,
+    )
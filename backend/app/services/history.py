@@ -0,0 +1,119 @@
+import json
+from functools import lru_cache
+from typing import Optional
+from app.schemas.chat import ChatMessage
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role等のメッセージごとのオーバーヘッド（概算）
+
+
+@lru_cache
+def _get_encoding():
+    """tiktokenがあれば使う（なければNoneで概算にフォールバック）"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """テキストのトークン数を数える
+
+    tiktokenがない場合は ASCII 4文字 = 1トークン、それ以外（日本語など）1文字 = 1トークンで概算する。
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # UTF-8で2バイト以上になる文字数を、バイト長と文字数の差から求める（Pythonループを避ける）
+    non_ascii = (len(text.encode("utf-8")) - len(text) + 1) // 2
+    ascii_chars = len(text) - non_ascii
+    return (ascii_chars + 3) // 4 + non_ascii
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """OpenAIに送るmessagesのトークン数を数える"""
+    total = 0
+    for msg in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(msg.get("content") or "")
+        for tool_call in msg.get("tool_calls") or []:
+            total += count_tokens(tool_call["function"]["arguments"])
+    return total
+
+
+def build_messages(
+    system_prompt: str,
+    history: list[ChatMessage],
+    message: str,
+    token_budget: int,
+    memo_chars: int = 60,
+    memo_max_lines: int = 10,
+    notes: Optional[str] = None,
+) -> tuple[list[dict], dict]:
+    """会話履歴をトークン予算に収まるよう圧縮してmessagesを組み立てる
+
+    新しいターンから予算に収まる分だけそのまま残し（スライディングウィンドウ）、
+    それより古いターンは1行ずつ切り詰めた要約メモにしてシステムメッセージで渡す。
+    notes（セッションに保存済みの要約や紹介済みの本）はシステムプロンプトの直後に渡す。
+    戻り値は (messages, 圧縮前後のトークン数などの統計)。
+    """
+    head = [{"role": "system", "content": system_prompt}]
+    if notes:
+        head.append({"role": "system", "content": notes})
+    user = {"role": "user", "content": message}
+    turns = [{"role": msg.role, "content": msg.content} for msg in history]
+
+    turn_tokens = [count_message_tokens([turn]) for turn in turns]
+    fixed_tokens = count_message_tokens([*head, user])
+    before = fixed_tokens + sum(turn_tokens)
+    stats = {"prompt_tokens_before": before, "prompt_tokens_after": before, "summarized_turns": 0}
+    if before <= token_budget:
+        return [*head, *turns, user], stats
+
+    # 要約メモの分を見込んで、新しいターンから予算に収まるだけ残す
+    # （日本語は1文字≒1トークンなので、1行あたり memo_chars + ラベル分で見積もる）
+    memo_reserve = MESSAGE_OVERHEAD_TOKENS + memo_max_lines * (memo_chars + 10)
+    available = token_budget - fixed_tokens - memo_reserve
+    keep_from = len(turns)
+    used = 0
+    while keep_from > 0 and used + turn_tokens[keep_from - 1] <= available:
+        keep_from -= 1
+        used += turn_tokens[keep_from]
+
+    older = turns[:keep_from]
+    memo = _summarize_turns(older, memo_chars, memo_max_lines)
+    messages = [*head, {"role": "system", "content": memo}, *turns[keep_from:], user]
+    stats["prompt_tokens_after"] = count_message_tokens(messages)
+    stats["summarized_turns"] = len(older)
+    return messages, stats
+
+
+def summarize_turn(turn: dict, memo_chars: int) -> str:
+    """1ターンを要約メモの1行にする（空白を詰めて memo_chars 文字で切り詰める）"""
+    labels = {"user": "ユーザー", "assistant": "アシスタント"}
+    text = " ".join(turn["content"].split())
+    if len(text) > memo_chars:
+        text = text[:memo_chars] + "…"
+    return f"- {labels.get(turn['role'], turn['role'])}: {text}"
+
+
+def _summarize_turns(turns: list[dict], memo_chars: int, memo_max_lines: int) -> str:
+    """古いターンを1行ずつ切り詰めた要約メモにする（LLMは呼ばない）"""
+    lines = [summarize_turn(turn, memo_chars) for turn in turns[-memo_max_lines:]]
+    omitted = len(turns) - len(lines)
+    header = "## これまでの会話の要約"
+    if omitted > 0:
+        header += f"（さらに古い{omitted}件は省略）"
+    return "\n".join([header, *lines])
+
+
+def compact_book_reference(total: int, books: list[dict]) -> str:
+    """過去ラウンドの検索結果を、IDとタイトルだけの参照に置き換えた文字列"""
+    return json.dumps({
+        "total": total,
+        "books": [{"id": book["id"], "title": book["title"]} for book in books],
+    }, ensure_ascii=False)
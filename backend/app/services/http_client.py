@@ -0,0 +1,39 @@
+import httpx
+from openai import AsyncOpenAI
+from app.config import Settings
+
+
+def create_cinii_client(settings: Settings) -> httpx.AsyncClient:
+    """CiNii向けの共有HTTPクライアントを作成する（接続プール・keep-aliveを再利用）"""
+    limits = httpx.Limits(
+        max_connections=settings.cinii_max_connections,
+        max_keepalive_connections=settings.cinii_max_keepalive_connections,
+        keepalive_expiry=settings.cinii_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.cinii_connect_timeout,
+        read=settings.cinii_read_timeout,
+        write=settings.cinii_read_timeout,
+        pool=settings.cinii_pool_timeout,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=settings.cinii_http2)
+
+
+def create_openai_client(settings: Settings) -> AsyncOpenAI:
+    """OpenAI向けの共有クライアントを作成する（接続プール・keep-aliveを再利用）
+
+    タイムアウトは呼び出しごとに締め切りの残り時間で指定するため、SDKの自動再試行は使わない。
+    """
+    limits = httpx.Limits(
+        max_connections=settings.openai_max_connections,
+        max_keepalive_connections=settings.openai_max_keepalive_connections,
+        keepalive_expiry=settings.openai_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(settings.openai_read_timeout, connect=settings.openai_connect_timeout)
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url or None,
+        max_retries=0,
+        timeout=timeout,
+        http_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
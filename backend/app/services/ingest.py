@@ -0,0 +1,218 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+from app.schemas.book import Book
+from app.services.book_index import BookIndex
+from app.services.cinii import _parse_cinii_response
+from app.services.json_backend import loads
+
+READ_CHUNK_SIZE = 1024 * 1024
+_DECODER = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,"
+
+
+@dataclass
+class IngestStats:
+    records: int = 0
+    books: int = 0
+    bytes_read: int = 0
+    start_offset: int = 0  # 再開した位置（スループット計算から除く）
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def summary(self, total_bytes: int) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        percent = f"{self.bytes_read / total_bytes:.1%}" if total_bytes else "-"
+        return (
+            f"{percent} records={self.records} books={self.books} "
+            f"({self.records / elapsed:.0f} rec/s, "
+            f"{(self.bytes_read - self.start_offset) / elapsed / 1024 / 1024:.1f} MB/s)"
+        )
+
+
+def iter_jsonl_items(fp: BinaryIO, offset: int) -> Iterator[tuple[dict, int]]:
+    """JSONLの各行から書誌アイテムを取り出す（戻り値は (item, 読み終えた位置)）
+
+    1行がCiNiiレスポンス全体（@graphあり）でも、アイテム1件でもよい。
+    """
+    fp.seek(offset)
+    position = offset
+    for line in fp:
+        line_start = position
+        position += len(line)
+        line = line.strip()
+        if not line:
+            continue
+        record = loads(line)
+        if "@graph" not in record:
+            yield record, position
+            continue
+        items = [item for graph in record["@graph"] for item in graph.get("items", [])]
+        for i, item in enumerate(items):
+            # 行の途中で中断した場合はその行の先頭から読み直す
+            yield item, position if i == len(items) - 1 else line_start
+
+
+def iter_jsonld_items(fp: BinaryIO, offset: int) -> Iterator[tuple[dict, int]]:
+    """CiNiiレスポンス形式のJSON-LDファイルから "items" 配列の要素を1件ずつ取り出す
+
+    ファイル全体を読み込まず、チャンクごとに配列の要素だけをデコードする。
+    offset が0以外の場合は、前回読み終えた配列要素の直後から再開する。
+    """
+    fp.seek(offset)
+    buffer = ""
+    cursor = 0  # buffer内の読み取り位置
+    position = offset  # cursorに対応するファイル上のバイト位置
+    pending = b""
+    in_items = offset > 0
+
+    def fill() -> bool:
+        nonlocal buffer, cursor, pending
+        chunk = fp.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+        data = pending + chunk
+        # マルチバイト文字の途中で切れた分は次のチャンクに回す
+        try:
+            text = data.decode("utf-8")
+            pending = b""
+        except UnicodeDecodeError as e:
+            text = data[:e.start].decode("utf-8")
+            pending = data[e.start:]
+        buffer = buffer[cursor:] + text
+        cursor = 0
+        return True
+
+    def advance(end: int) -> None:
+        nonlocal cursor, position
+        position += len(buffer[cursor:end].encode("utf-8"))
+        cursor = end
+
+    while True:
+        if not in_items:
+            start = buffer.find('"items"', cursor)
+            if start < 0:
+                # キー名がチャンク境界をまたぐ場合に備えて末尾を残す
+                advance(max(cursor, len(buffer) - len('"items"')))
+                if not fill():
+                    return
+                continue
+            bracket = buffer.find("[", start)
+            if bracket < 0:
+                if not fill():
+                    return
+                continue
+            advance(bracket + 1)
+            in_items = True
+
+        end = cursor
+        while end < len(buffer) and buffer[end] in _SEPARATORS:
+            end += 1
+        advance(end)
+        if cursor >= len(buffer):
+            if not fill():
+                return
+            continue
+        if buffer[cursor] == "]":
+            advance(cursor + 1)
+            in_items = False
+            continue
+        try:
+            item, end = _DECODER.raw_decode(buffer, cursor)
+        except json.JSONDecodeError:
+            # 要素がチャンク境界で途切れている
+            if not fill():
+                raise
+            continue
+        advance(end)
+        yield item, position
+
+
+def iter_batches(items: Iterator[tuple[dict, int]], batch_size: int) -> Iterator[tuple[list[Book], int, int]]:
+    """アイテムをまとめて_parse_cinii_responseに通す（戻り値は (books, 件数, 読み終えた位置)）"""
+    batch: list[dict] = []
+    position = 0
+    for item, position in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield _parse_batch(batch), len(batch), position
+            batch = []
+    if batch:
+        yield _parse_batch(batch), len(batch), position
+
+
+def _parse_batch(items: list[dict]) -> list[Book]:
+    books = _parse_cinii_response({"@graph": [{"items": items}]})
+    # バッチ内の重複はID・ISBNで後勝ちにまとめる（索引側でも一意制約で上書きされる）
+    by_id: dict[str, Book] = {}
+    id_by_isbn: dict[str, str] = {}
+    for book in books:
+        if book.isbn:
+            previous = id_by_isbn.get(book.isbn)
+            if previous is not None and previous != book.id:
+                by_id.pop(previous, None)
+            id_by_isbn[book.isbn] = book.id
+        by_id[book.id] = book
+    return list(by_id.values())
+
+
+class Checkpoint:
+    """ファイルごとの取り込み済み位置を保存し、再実行時に続きから再開する"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data = json.loads(path.read_text()) if path.exists() else {}
+
+    def offset_for(self, source: Path) -> int:
+        entry = self._data.get(str(source.resolve()))
+        stat = source.stat()
+        if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            return 0
+        return entry["offset"]
+
+    def save(self, source: Path, offset: int) -> None:
+        stat = source.stat()
+        self._data[str(source.resolve())] = {"offset": offset, "size": stat.st_size, "mtime": stat.st_mtime}
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data))
+        os.replace(tmp, self.path)
+
+
+def ingest_file(
+    source: Path,
+    index: BookIndex,
+    batch_size: int = 1000,
+    checkpoint: Optional[Checkpoint] = None,
+    report: Optional[Callable[[IngestStats, int], None]] = None,
+    report_interval: float = 5.0,
+) -> IngestStats:
+    """1ファイルを索引に取り込む（メモリ使用量はバッチサイズ分で一定）"""
+    total_bytes = source.stat().st_size
+    offset = checkpoint.offset_for(source) if checkpoint else 0
+    stats = IngestStats(bytes_read=offset, start_offset=offset)
+    last_report = time.monotonic()
+    iter_items = iter_jsonl_items if source.suffix in (".jsonl", ".ndjson") else iter_jsonld_items
+
+    with source.open("rb") as fp:
+        for books, records, position in iter_batches(iter_items(fp, offset), batch_size):
+            stats.books += index.upsert(books)
+            stats.records += records
+            stats.bytes_read = position
+            if checkpoint:
+                checkpoint.save(source, position)
+            if report and time.monotonic() - last_report >= report_interval:
+                report(stats, total_bytes)
+                last_report = time.monotonic()
+
+    stats.bytes_read = total_bytes
+    if checkpoint:
+        checkpoint.save(source, total_bytes)
+    if report:
+        report(stats, total_bytes)
+    return stats
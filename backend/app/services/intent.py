@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import date
+from typing import Literal, Optional
+from app.schemas.chat import ChatMessage
+
+# search: LLMに検索条件を考えさせずCiNiiを直接検索する / chat: 検索しない / plan: 従来どおりLLMに任せる
+Route = Literal["search", "chat", "plan"]
+
+_TAIL = r"(を|が|は)?(探して(います|る)?|教えて(ください)?|知りたい(です)?|読みたい(です)?|ありますか|ある|ください|一覧)?[?!。\s]*"
+
+_CHAT_RE = re.compile(
+    r"^(こんにちは|こんばんは|おはよう(ございます)?|はじめまして|よろしく(お願いします)?"
+    r"|ありがとう(ございます|ございました)?|どうも|さようなら|またね|おやすみ(なさい)?"
+    r"|了解(です)?|わかりました|hi|hello|hey|thanks|thank you|bye"
+    r"|(あなた|君)は(誰|だれ|何|なに)(ですか)?|何ができる(の|んですか)?)[!?。.~〜ー\s]*$",
+    re.IGNORECASE,
+)
+_ISBN_RE = re.compile(rf"^(isbn:?\s*)?(?P<isbn>97[89]\d{{10}}|\d{{9}}[\dx])(の本)?{_TAIL}$", re.IGNORECASE)
+_TITLE_RE = re.compile(rf"^[「『](?P<title>[^」』]{{1,60}})[」』](という本|って本)?{_TAIL}$")
+_SUBJECT_RE = re.compile(
+    r"^(?P<subject>[^\s、。]{2,20}?)の"
+    r"(?P<kind>最新刊|新刊|最新作|新作|本|書籍|著書|著作|作品|小説|エッセイ|漫画|マンガ|絵本|写真集)"
+    rf"{_TAIL}$"
+)
+# 主題がこれらを含む場合は、検索語の工夫や推薦理由が必要なのでLLMに任せる
+_VAGUE_RE = re.compile(
+    r"おすすめ|お勧め|オススメ|いい|良い|面白|入門|初心者|向け|ような|みたい|っぽい|について|関する"
+    r"|気分|悩|どんな|何か|なにか|簡単|わかりやすい|やさしい|人気|有名"
+)
+# 直前の会話を指す表現（履歴があるときはLLMに任せる）
+_REFERENCE_RE = re.compile(r"それ|その|あの|この|さっき|先ほど|前の|他の|ほか|もっと|\d+冊目|\d+つ目|一冊目")
+
+_NEW_RELEASE_KINDS = {"最新刊", "新刊", "最新作", "新作"}
+# 主題と組み合わせて検索語に含める種別（「本」「作品」などは検索語にしない）
+_GENRE_KINDS = {"小説", "エッセイ", "漫画", "マンガ", "絵本", "写真集"}
+
+
+@dataclass
+class Intent:
+    route: Route
+    reason: str
+    params: Optional[dict] = None  # route="search" のときの search_books の引数
+
+
+def classify_intent(message: str, history: list[ChatMessage]) -> Intent:
+    """メッセージを規則で分類し、LLMの検索判断を省けるかを決める
+
+    明示的な検索（「村上春樹の新刊」「『ノルウェイの森』」、ISBN）は search、
+    挨拶などは chat、それ以外や直前の会話を指すものは plan にする。迷ったら plan。
+    """
+    text = unicodedata.normalize("NFKC", message).strip()
+    if history and _REFERENCE_RE.search(text):
+        return Intent("plan", "history_reference")
+    if _CHAT_RE.match(text):
+        return Intent("chat", "small_talk")
+
+    if match := _ISBN_RE.match(text.replace("-", "")):
+        return Intent("search", "isbn", {"query": match["isbn"].upper()})
+    if match := _TITLE_RE.match(text):
+        return Intent("search", "title", {"title": match["title"].strip()})
+    if (match := _SUBJECT_RE.match(text)) and not _VAGUE_RE.search(match["subject"]):
+        kind = match["kind"]
+        query = match["subject"] + (f" {kind}" if kind in _GENRE_KINDS else "")
+        params = {"query": query}
+        if kind in _NEW_RELEASE_KINDS:
+            params["year_from"] = date.today().year - 1
+        return Intent("search", "subject", params)
+    return Intent("plan", "default")
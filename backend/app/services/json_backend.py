@@ -0,0 +1,16 @@
+import json
+
+# orjsonがインストールされていれば高速なデコーダを使い、なければ標準ライブラリにフォールバックする
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: bytes | str):
+    """JSONをデコードする（バックエンドは JSON_BACKEND）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,178 @@
+import math
+from bisect import bisect_left
+from typing import Iterable
+
+# 秒単位のレイテンシ用の既定バケット
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    """ラベル付きメトリクスの共通部分（イベントループ上からのみ更新する前提でロックしない）"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """バケット別の件数と合計値を持つヒストグラム"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの組ごとに [各バケットの件数..., +Infの件数], 合計
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                labels = self._label_text(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(self._sums[key])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+OPENAI_REQUEST_SECONDS = Histogram(
+    "openai_request_duration_seconds",
+    "OpenAI chat completion latency per call (first: first round, followup: later tool rounds, final: the answer)",
+    ("call",),
+)
+OPENAI_FIRST_CHUNK_SECONDS = Histogram(
+    "openai_first_chunk_seconds",
+    "Time until the first streamed chunk of an OpenAI call",
+    ("call",),
+)
+OPENAI_TOKENS = Histogram(
+    "openai_tokens",
+    "Tokens per OpenAI call from response usage (kind: prompt, completion, cached)",
+    ("kind",),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+CINII_REQUEST_SECONDS = Histogram(
+    "cinii_request_duration_seconds",
+    "CiNii GET latency by HTTP status and error type",
+    ("status", "error_type"),
+)
+CINII_PARSE_SECONDS = Histogram(
+    "cinii_parse_duration_seconds",
+    "Time to decode and parse a CiNii response",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+CINII_ERRORS = Counter(
+    "cinii_errors_total",
+    "CiNii search errors returned to callers by error type",
+    ("error_type",),
+)
+CHAT_TOOL_CALLS = Histogram(
+    "chat_tool_calls_per_turn",
+    "search_books tool calls requested per chat turn",
+    buckets=(0, 1, 2, 3, 4, 6, 8),
+)
+CHAT_INTENTS = Counter(
+    "chat_intent_routes_total",
+    "Chat turns by locally classified intent route (search, chat, plan)",
+    ("route",),
+)
+
+CHAT_RESPONSE_CACHE = Counter(
+    "chat_response_cache_lookups_total",
+    "Chat response cache lookups by result (exact, fuzzy, miss, bypass)",
+    ("result",),
+)
+CHAT_RESPONSE_CACHE_SAVED_SECONDS = Counter(
+    "chat_response_cache_saved_seconds_total",
+    "Original latency of chat turns answered from the response cache",
+)
+CHAT_PREFETCH = Counter(
+    "chat_prefetch_total",
+    "Speculative follow-up searches by result (fetched, cached, throttled, dropped, errors, hits, wasted)",
+    ("result",),
+)
+
+REGISTRY: tuple[_Metric, ...] = (
+    OPENAI_REQUEST_SECONDS,
+    OPENAI_FIRST_CHUNK_SECONDS,
+    OPENAI_TOKENS,
+    CINII_REQUEST_SECONDS,
+    CINII_PARSE_SECONDS,
+    CINII_ERRORS,
+    CHAT_TOOL_CALLS,
+    CHAT_INTENTS,
+    CHAT_RESPONSE_CACHE,
+    CHAT_RESPONSE_CACHE_SAVED_SECONDS,
+    CHAT_PREFETCH,
+)
+
+
+def render_metrics() -> str:
+    """Prometheusのテキスト形式（version 0.0.4）で全メトリクスを出力する"""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
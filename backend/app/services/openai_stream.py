@@ -0,0 +1,64 @@
+from typing import Optional
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from openai.types.completion_usage import CompletionUsage
+
+
+class StreamedCompletion:
+    """ストリーミング応答のchunkを逐次組み立てる
+
+    テキストは届いた順に連結し、tool callの引数断片はindexごとに連結する。
+    """
+
+    def __init__(self):
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[CompletionUsage] = None
+
+    def add(self, chunk: ChatCompletionChunk) -> Optional[str]:
+        """chunkを取り込み、テキスト差分があれば返す"""
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+
+        delta = choice.delta
+        for fragment in delta.tool_calls or []:
+            call = self._tool_calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": []})
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function is not None:
+                if fragment.function.name:
+                    call["name"] += fragment.function.name
+                if fragment.function.arguments:
+                    call["arguments"].append(fragment.function.arguments)
+
+        if delta.content:
+            self._content.append(delta.content)
+            return delta.content
+        return None
+
+    @property
+    def content(self) -> Optional[str]:
+        return "".join(self._content) if self._content else None
+
+    def message(self) -> ChatCompletionMessage:
+        """組み立て済みのアシスタントメッセージ（非ストリーミング時と同じ型）"""
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=call["id"],
+                type="function",
+                function=Function(name=call["name"], arguments="".join(call["arguments"])),
+            )
+            for _, call in sorted(self._tool_calls.items())
+        ]
+        return ChatCompletionMessage(
+            role="assistant",
+            content=self.content,
+            tool_calls=tool_calls or None,
+        )
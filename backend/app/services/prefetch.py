@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+import httpx
+from app.config import get_settings
+from app.schemas.book import Book, BookSearchParams
+from app.services.cinii import CiNiiAPIError, search_books
+from app.services.deadline import Deadline
+from app.services.metrics import CHAT_PREFETCH
+from app.services.ranking import first_author
+from app.services.resilience import get_circuit_breaker, get_rate_limiter
+from app.services.search_cache import SearchCache, get_search_cache, make_search_key
+
+RECENT_YEARS = 5  # 「最近の本」に絞るときの年数
+TOP_AUTHORS = 2
+# 「もう少し軽め」「入門向け」などの聞き返しに備えて付ける語
+VARIANT_TERMS = ("入門", "新書")
+
+
+def followup_searches(
+    params: BookSearchParams,
+    books: list[Book],
+    limit: int,
+    current_year: Optional[int] = None,
+) -> list[BookSearchParams]:
+    """検索結果から、次のターンで聞かれそうな検索を優先順に limit 件まで作る
+
+    入門・新書を付けた検索、結果に多い著者の検索、最近の出版年に絞った検索の順。
+    件数は元の検索に合わせ、ページは1に戻す。元の検索と同じキーになるものは除く。
+    """
+    base = params.model_copy(update={"page": 1})
+    candidates: list[BookSearchParams] = []
+
+    keyword = params.query or params.title
+    if keyword:
+        for term in VARIANT_TERMS:
+            if term not in keyword:
+                candidates.append(base.model_copy(update={"query": f"{keyword} {term}", "title": None}))
+
+    authors = Counter(first_author(book.authors[0]) for book in books if book.authors)
+    for author, _ in authors.most_common(TOP_AUTHORS):
+        if author and author != params.author:
+            candidates.append(BookSearchParams(author=author, count=params.count))
+
+    current_year = current_year or date.today().year
+    if params.year_from is None or params.year_from < current_year - RECENT_YEARS:
+        candidates.append(base.model_copy(update={"year_from": current_year - RECENT_YEARS, "year_to": None}))
+
+    seen = {make_search_key(params)}
+    followups = []
+    for candidate in candidates:
+        key = make_search_key(candidate)
+        if key not in seen:
+            seen.add(key)
+            followups.append(candidate)
+    return followups[:limit]
+
+
+class SearchPrefetcher:
+    """チャットのターン後に、次に来そうな検索を裏で実行して検索キャッシュを温める
+
+    チャットの検索より優先度を下げるため、同時実行数と待ち件数に上限を設け、
+    レートリミッターのトークンが min_tokens 未満ならCiNiiに問い合わせずに取りやめる。
+    先読みした検索がキャッシュの有効期間内にチャットで使われたら hit、使われなければ wasted と数える。
+    """
+
+    def __init__(
+        self,
+        cache: SearchCache,
+        concurrency: int = 2,
+        max_pending: int = 16,
+        min_tokens: float = 2.0,
+        timeout: float = 10.0,
+        max_tracked: int = 1024,
+    ):
+        self.cache = cache
+        self.max_pending = max_pending
+        self.min_tokens = min_tokens
+        self.timeout = timeout
+        self.max_tracked = max_tracked
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        # 実行待ち・実行中の先読み（キー → チャットで既に使われたか）
+        self._pending: dict[str, bool] = {}
+        self._tasks: set[asyncio.Task] = set()
+        # 先読み済みでまだ使われていない検索（キー → 取得時刻）
+        self._unused: OrderedDict[str, float] = OrderedDict()
+        self.stats = {
+            "lookups": 0,
+            "scheduled": 0,
+            "fetched": 0,
+            "cached": 0,
+            "throttled": 0,
+            "dropped": 0,
+            "errors": 0,
+            "hits": 0,
+            "wasted": 0,
+        }
+
+    def schedule(self, searches: list[BookSearchParams], client: httpx.AsyncClient) -> int:
+        """先読みをバックグラウンドで開始する（待たない）。開始した件数を返す"""
+        scheduled = 0
+        for params in searches:
+            key = make_search_key(params)
+            if key in self._pending or key in self._unused:
+                continue
+            if len(self._pending) >= self.max_pending:
+                self._count("dropped")
+                continue
+            self._pending[key] = False
+            task = asyncio.create_task(self._prefetch(key, params, client))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            scheduled += 1
+        self.stats["scheduled"] += scheduled
+        return scheduled
+
+    def record_search(self, params: BookSearchParams) -> None:
+        """チャットからの検索を記録し、先読み済み（または先読み中）なら hit と数える"""
+        self._expire()
+        self.stats["lookups"] += 1
+        key = make_search_key(params)
+        if key in self._unused:
+            del self._unused[key]
+            self._count("hits")
+        elif self._pending.get(key) is False:
+            # 先読み中の検索には検索側の single-flight で相乗りする
+            self._pending[key] = True
+            self._count("hits")
+
+    def snapshot(self) -> dict:
+        """監視用の統計情報（hit_rate: チャットの検索のうち先読みで済んだ割合、wasted_ratio: 先読みのうち使われなかった割合）"""
+        self._expire()
+        resolved = self.stats["hits"] + self.stats["wasted"]
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "unused": len(self._unused),
+            "hit_rate": self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0,
+            "wasted_ratio": self.stats["wasted"] / resolved if resolved else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _prefetch(self, key: str, params: BookSearchParams, client: httpx.AsyncClient) -> None:
+        try:
+            async with self._semaphore:
+                if self.cache.contains(key):
+                    self._count("cached")
+                    return
+                if get_circuit_breaker().state == "open" or get_rate_limiter().available() < self.min_tokens:
+                    self._count("throttled")
+                    return
+                try:
+                    await search_books(params, client, deadline=Deadline.after(self.timeout))
+                except CiNiiAPIError:
+                    self._count("errors")
+                    return
+                self._count("fetched")
+                if not self._pending.get(key):
+                    self._unused[key] = time.monotonic()
+                    while len(self._unused) > self.max_tracked:
+                        self._unused.popitem(last=False)
+                        self._count("wasted")
+        finally:
+            self._pending.pop(key, None)
+
+    def _expire(self) -> None:
+        """キャッシュの有効期間を過ぎても使われなかった先読みを wasted にする"""
+        limit = time.monotonic() - self.cache.ttl
+        while self._unused and next(iter(self._unused.values())) < limit:
+            self._unused.popitem(last=False)
+            self._count("wasted")
+
+    def _count(self, result: str) -> None:
+        self.stats[result] += 1
+        CHAT_PREFETCH.inc(result=result)
+
+
+@lru_cache
+def get_search_prefetcher() -> Optional[SearchPrefetcher]:
+    """設定に基づいてアプリ共有の先読みを返す（無効、または検索キャッシュが無効ならNone）"""
+    settings = get_settings()
+    cache = get_search_cache()
+    if not settings.chat_prefetch_enabled or cache is None:
+        return None
+    return SearchPrefetcher(
+        cache,
+        concurrency=settings.chat_prefetch_concurrency,
+        max_pending=settings.chat_prefetch_max_pending,
+        min_tokens=settings.chat_prefetch_min_tokens,
+        timeout=settings.chat_prefetch_timeout,
+    )
@@ -0,0 +1,181 @@
+import math
+import re
+import unicodedata
+from datetime import date
+from functools import lru_cache
+from typing import Iterable, Optional
+from app.schemas.book import Book
+
+# NumPyがインストールされていれば候補が多いときにベクトル化して採点し、なければ同じ計算をPythonで行う
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RANKING_BACKEND = "numpy" if np is not None else "python"
+# 候補がこれより少なければNumPyを使わない（配列を作る手間の方が大きい）
+NUMPY_MIN_BOOKS = 100
+
+# スコア = 重み付き和（各特徴量は0〜1）
+POPULARITY_WEIGHT = 0.5  # 所蔵館数（対数）
+RELEVANCE_WEIGHT = 0.35  # 検索語の文字bigramがタイトルに含まれる割合
+RECENCY_WEIGHT = 0.15  # 出版年の新しさ
+RECENCY_SCALE_YEARS = 15.0  # この年数で新しさのスコアが 1/e になる
+
+_YEAR_RE = re.compile(r"\d{4}")
+# 照合で無視する記号・空白
+_SYMBOLS_RE = re.compile(r"[\W_]+")
+# 版違いをまとめるときに無視する表記（版表示とそれを含む括弧書き・叢書の種別。巻数は残す）
+_EDITION_RE = re.compile(
+    r"[(\[【〈][^)\]】〉]*(版|文庫|新書|edition)[^)\]】〉]*[)\]】〉]"
+    r"|第\d+版|(新装|改訂|増補|決定|普及|愛蔵|完全|新)版|文庫|新書"
+)
+# 著者表示の末尾の役割表示（「村上春樹著」「河合隼雄 [ほか] 編」など）
+_ROLE_RE = re.compile(r"\s*(\[?ほか\]?)?\s*[\[(（]?(編集・監修|編集|編著|共著|監修|著|編|訳|作|文|絵)[\])）]?$")
+# 複数の責任表示の区切り（「バートランド・ラッセル著 ; 高村夏輝訳」など）
+_CREATOR_SEP_RE = re.compile(r"\s*[;；,，、]\s*")
+# 正規化済みタイトルをつなぐ区切り文字（記号なので正規化済みタイトルには含まれない）
+_SEP = "\x1f"
+
+
+def first_author(creator: str) -> str:
+    """著者表示（CiNiiの dc:creator）から最初の1人の名前を取り出す（役割表示は除く）"""
+    return _ROLE_RE.sub("", _CREATOR_SEP_RE.split(creator.strip(), maxsplit=1)[0])
+
+
+@lru_cache(maxsize=65536)
+def normalize_title(title: str) -> tuple[str, str]:
+    """タイトルを (照合用の正規化文字列, 版表示を除いた正規化文字列) にする（本ごとに1回だけ計算する）"""
+    text = unicodedata.normalize("NFKC", title).casefold()
+    normalized = _SYMBOLS_RE.sub("", text)
+    return normalized, _SYMBOLS_RE.sub("", _EDITION_RE.sub("", text)) or normalized
+
+
+@lru_cache(maxsize=65536)
+def author_key(creator: str) -> str:
+    """版違いをまとめるときに比べる最初の著者（正規化済み）"""
+    return _SYMBOLS_RE.sub("", unicodedata.normalize("NFKC", first_author(creator)).casefold())
+
+
+def prepare_books(books: Iterable[Book]) -> None:
+    """タイトル・著者の正規化を済ませておく（CiNiiのレスポンスをパースしたときに呼び、採点時は結果を引くだけにする）"""
+    for book in books:
+        normalize_title(book.title)
+        if book.authors:
+            author_key(book.authors[0])
+
+
+def edition_keys(books: list[Book]) -> list[tuple[str, str]]:
+    """版違いをまとめるキー（版表示を除いたタイトルと最初の著者。同名の別の本はまとめない）"""
+    return [_edition_key(book) for book in books]
+
+
+@lru_cache(maxsize=1024)
+def query_bigrams(query: str) -> tuple[str, ...]:
+    """検索語（空白区切りの各語）の文字bigram。1文字の語はそのまま使う"""
+    grams: list[str] = []
+    for term in query.split():
+        normalized = normalize_title(term)[0]
+        if len(normalized) == 1:
+            grams.append(normalized)
+        grams.extend(normalized[i:i + 2] for i in range(len(normalized) - 1))
+    return tuple(dict.fromkeys(grams))
+
+
+def score_books(books: list[Book], query: str, current_year: Optional[int] = None) -> list[float]:
+    """候補の本ごとのスコア（所蔵館数・検索語との一致・新しさの重み付き和）"""
+    if not books:
+        return []
+    scores = _scores(books, query, current_year)
+    return scores if isinstance(scores, list) else scores.tolist()
+
+
+def rank_books(books: list[Book], query: str, top_k: int, current_year: Optional[int] = None) -> list[Book]:
+    """候補を採点し、版違い（版表示を除いたタイトルと最初の著者、またはISBNが同じ本）は
+    最高スコアの1冊にまとめて上位 top_k 件を返す"""
+    if not books or top_k <= 0:
+        return []
+    scores = _scores(books, query, current_year)
+    if isinstance(scores, list):
+        order = sorted(range(len(books)), key=lambda i: -scores[i])
+    else:
+        order = np.argsort(-scores, kind="stable").tolist()
+    ranked: list[Book] = []
+    seen: set[tuple[str, str] | str] = set()
+    # 版違いのキーは上位から見ていく本の分だけ作る
+    for i in order:
+        book = books[i]
+        key = _edition_key(book)
+        if key in seen or (book.isbn and book.isbn in seen):
+            continue
+        seen.add(key)
+        if book.isbn:
+            seen.add(book.isbn)
+        ranked.append(book)
+        if len(ranked) >= top_k:
+            break
+    return ranked
+
+
+def _edition_key(book: Book) -> tuple[str, str]:
+    return normalize_title(book.title)[1], author_key(book.authors[0]) if book.authors else ""
+
+
+@lru_cache(maxsize=4096)
+def _parse_year(value: Optional[str]) -> int:
+    match = _YEAR_RE.search(value) if value else None
+    return int(match.group()) if match else 0
+
+
+def _scores(books: list[Book], query: str, current_year: Optional[int]):
+    """スコアを返す。候補が NUMPY_MIN_BOOKS 件以上でNumPyがあれば配列、それ以外はリスト"""
+    current_year = current_year or date.today().year
+    grams = query_bigrams(query)
+    # 本ごとのタプルを作るとGCが走るので、属性ごとにリストにする
+    titles = [normalize_title(book.title)[0] for book in books]
+    years = list(map(_parse_year, [book.year for book in books]))
+    owners = [book.owner_count for book in books]
+    if np is not None and len(books) >= NUMPY_MIN_BOOKS:
+        return _score_numpy(owners, years, _relevance_numpy(titles, grams), current_year)
+    relevance = [sum(gram in title for gram in grams) / len(grams) if grams else 0.0 for title in titles]
+    return _score_python(owners, years, relevance, current_year)
+
+
+def _relevance_numpy(titles: list[str], grams: tuple[str, ...]):
+    """検索語のbigramのうちタイトルに含まれる割合（タイトルをつないだ文字列を検索し、出現位置を二分探索で本に対応付ける）"""
+    relevance = np.zeros(len(titles))
+    if not grams:
+        return relevance
+    joined = _SEP.join(titles)
+    lengths = np.fromiter(map(len, titles), dtype=np.int64, count=len(titles))
+    starts = np.cumsum(lengths + 1) - (lengths + 1)
+    hit = np.empty(len(titles), dtype=bool)
+    for gram in grams:
+        positions = [match.start() for match in re.finditer(re.escape(gram), joined)]
+        if positions:
+            hit.fill(False)
+            hit[np.searchsorted(starts, positions, side="right") - 1] = True
+            relevance += hit
+    return relevance / len(grams)
+
+
+def _score_numpy(owners, years, relevance, current_year: int):
+    # owner_count が None の本は nan になるので0として扱う
+    popularity = np.log1p(np.nan_to_num(np.array(owners, dtype=np.float64)))
+    top = popularity.max(initial=0.0)
+    if top > 0:
+        popularity /= top
+    year_arr = np.array(years, dtype=np.float64)
+    recency = np.where(year_arr > 0, np.exp(-np.maximum(current_year - year_arr, 0.0) / RECENCY_SCALE_YEARS), 0.0)
+    return POPULARITY_WEIGHT * popularity + RELEVANCE_WEIGHT * relevance + RECENCY_WEIGHT * recency
+
+
+def _score_python(owners, years, relevance, current_year: int) -> list[float]:
+    popularity = [math.log1p(owner or 0) for owner in owners]
+    top = max(popularity, default=0.0)
+    return [
+        POPULARITY_WEIGHT * (pop / top if top > 0 else 0.0)
+        + RELEVANCE_WEIGHT * rel
+        + RECENCY_WEIGHT * (math.exp(-max(current_year - year, 0) / RECENCY_SCALE_YEARS) if year else 0.0)
+        for pop, year, rel in zip(popularity, years, relevance)
+    ]
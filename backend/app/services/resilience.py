@@ -0,0 +1,243 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional
+from app.config import get_settings
+
+
+class AdaptiveRateLimiter:
+    """CiNiiへのリクエストを間引くトークンバケット（AIMDでレートを自動調整）
+
+    成功するたびにレートを少しずつ上げ（加算）、429を受けたら半分に下げる（乗算）。
+    Retry-Afterが返された場合はその時刻まで全リクエストを止める。
+    トークンは前借り（マイナス）を許し、各呼び出しは予約した分だけ待つのでロック不要で順番も保たれる。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float,
+        max_rate: float,
+        increase_step: float = 0.1,
+        decrease_factor: float = 0.5,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.stats = {"acquired": 0, "throttled": 0, "rate_limited": 0}
+
+    async def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """トークンを1つ取得する（足りなければ待つ）
+
+        max_wait 秒以内に取得できない見込みなら待たずにFalseを返す。
+        """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1:
+            wait += (1 - self._tokens) / self.rate
+        if max_wait is not None and wait > max_wait:
+            return False
+        self._tokens -= 1
+        self.stats["acquired"] += 1
+        if wait > 0:
+            self.stats["throttled"] += 1
+            await asyncio.sleep(wait)
+        # 待っている間にRetry-Afterで停止された場合はそれにも従う
+        while (remaining := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+        return True
+
+    def try_acquire(self) -> bool:
+        """待たずに取得できる場合だけトークンを1つ取得する"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._tokens < 1 or now < self._paused_until:
+            return False
+        self._tokens -= 1
+        self.stats["acquired"] += 1
+        return True
+
+    def available(self) -> float:
+        """今すぐ使えるトークン数（Retry-Afterで停止中なら0）。優先度の低い呼び出しが空きを確かめるのに使う"""
+        now = time.monotonic()
+        self._refill(now)
+        return 0.0 if now < self._paused_until else max(0.0, self._tokens)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        self.stats["rate_limited"] += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def snapshot(self) -> dict:
+        """監視用の状態"""
+        self._refill(time.monotonic())
+        return {
+            **self.stats,
+            "rate": round(self.rate, 3),
+            "tokens": round(self._tokens, 3),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class CircuitBreaker:
+    """CiNiiの障害時に呼び出しを止めるサーキットブレーカー
+
+    closed: 通常 / open: 即座に失敗させる / half_open: reset_timeout経過後に1件だけ試す
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """呼び出してよいか（falseならopen中）"""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.stats["rejected"] += 1
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.stats["rejected"] += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.stats["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """試行がキャンセル等で結果なく終わった場合に、次の試行を許可する"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        """監視用の状態"""
+        retry_in = 0.0
+        if self.state == "open":
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        return {
+            **self.stats,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_in": round(retry_in, 3),
+        }
+
+
+class LatencyTracker:
+    """直近のCiNii応答時間からヘッジ（重複リクエスト）を送るまでの待ち時間を決める"""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.stats = {"hedged": 0, "hedge_wins": 0}
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self, floor: float) -> Optional[float]:
+        """p95の応答時間（サンプル不足ならNone = ヘッジしない）"""
+        p95 = self.percentile(0.95)
+        return None if p95 is None else max(floor, p95)
+
+    def snapshot(self) -> dict:
+        """監視用の状態"""
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            **self.stats,
+            "samples": len(self._samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """再試行までの待ち時間（指数バックオフ + full jitter。Retry-Afterがあればそれ以上待つ）"""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を秒数にする"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """アプリ共有のCiNii向けレートリミッター"""
+    settings = get_settings()
+    return AdaptiveRateLimiter(
+        rate=settings.cinii_rate_limit,
+        burst=settings.cinii_rate_limit_burst,
+        min_rate=settings.cinii_rate_limit_min,
+        max_rate=settings.cinii_rate_limit_max,
+    )
+
+
+@lru_cache
+def get_circuit_breaker() -> CircuitBreaker:
+    """アプリ共有のCiNii向けサーキットブレーカー"""
+    settings = get_settings()
+    return CircuitBreaker(
+        failure_threshold=settings.cinii_breaker_failure_threshold,
+        reset_timeout=settings.cinii_breaker_reset_timeout,
+    )
+
+
+@lru_cache
+def get_latency_tracker() -> LatencyTracker:
+    """アプリ共有のCiNii応答時間トラッカー"""
+    return LatencyTracker()
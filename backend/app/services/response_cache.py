@@ -0,0 +1,224 @@
+import copy
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from app.config import get_settings
+from app.schemas.chat import ChatMessage
+from app.services.metrics import CHAT_RESPONSE_CACHE, CHAT_RESPONSE_CACHE_SAVED_SECONDS
+
+_HIRAGANA_RE = re.compile(r"[ぁ-ゟ]+")
+# 個人的な事情を含む会話はキャッシュしない（同じ文面でも回答を使い回すべきでない）
+_PERSONAL_RE = re.compile(
+    r"(私|わたし|僕|ぼく|俺|おれ|自分|うち)(は|の|が|も|に)"
+    r"|名前|年齢|\d+\s*(歳|才)|子ども|子供|息子|娘|夫|妻|彼氏|彼女|家族"
+    r"|@|\d{2,4}-\d{2,4}-\d{3,4}"
+)
+# 否定・除外を含む文は、ひらがなを落とすと意味が逆転しうるので完全一致のみにする
+_NEGATION_RE = re.compile(r"以外|じゃない|ではない|でない|ない本|除く|not\b", re.IGNORECASE)
+# 年・件数などの数字は1文字違いでも意味が変わるので、あいまい一致でも完全に一致する場合だけ使い回す
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + casefold し、空白・記号を取り除く"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PSZC")
+
+
+def content_bigrams(normalized: str) -> frozenset[str]:
+    """あいまい一致用の特徴（ひらがなを除いた内容語の文字bigram）
+
+    「おすすめの哲学入門書」と「哲学の入門書を教えて」はどちらも「哲学入門書」になる。
+    内容語が短すぎる場合は全文のbigramを使う。
+    """
+    content = _HIRAGANA_RE.sub("", normalized)
+    if len(content) < 2:
+        content = normalized
+    if len(content) < 2:
+        return frozenset({content}) if content else frozenset()
+    return frozenset(content[i:i + 2] for i in range(len(content) - 1))
+
+
+def dice(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass
+class _Entry:
+    context: str  # 正規化したセッションのメモと直前までの履歴
+    grams: frozenset[str]
+    numbers: tuple[str, ...]  # メッセージ中の数字の並び（あいまい一致でも一致が必要）
+    fuzzy: bool
+    payload: dict  # doneイベントのdata
+    latency: float  # 元の応答にかかった秒数
+    stored_at: float  # time.monotonic()
+
+
+@dataclass
+class CachedResponse:
+    payload: dict
+    match: str  # "exact" / "fuzzy"
+    score: float
+    latency: float
+
+
+class ResponseCache:
+    """チャット1ターン分の応答（doneイベント）のキャッシュ
+
+    キーはセッションのメモ（notes）、直近 max_history 件の履歴、今回のメッセージを正規化したもの。
+    メモと履歴が同じで今回のメッセージが完全一致、または内容語bigramの類似度が threshold 以上
+    （かつ数字の並びが同じ）なら使い回す。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 3600.0,
+        threshold: float = 0.85,
+        max_history: int = 2,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_history = max_history
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # あいまい一致の候補を絞るための bigram → キー の索引
+        self._by_gram: dict[str, set[str]] = {}
+        self.stats = {
+            "exact_hits": 0,
+            "fuzzy_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def is_cacheable(self, message: str, history: list[ChatMessage], notes: Optional[str] = None) -> bool:
+        """履歴が長すぎる・個人的な事情を含む会話（セッションのメモを含む）はキャッシュを使わない"""
+        if len(history) > self.max_history:
+            return False
+        texts = [message, *(msg.content for msg in history if msg.role == "user"), notes or ""]
+        return not any(_PERSONAL_RE.search(text) for text in texts)
+
+    def lookup(
+        self, message: str, history: list[ChatMessage], notes: Optional[str] = None
+    ) -> Optional[CachedResponse]:
+        if not self.is_cacheable(message, history, notes):
+            self.stats["bypassed"] += 1
+            CHAT_RESPONSE_CACHE.inc(result="bypass")
+            return None
+        context, normalized = _context_key(history, notes), normalize_text(message)
+        now = time.monotonic()
+
+        key = context + "\x00" + normalized
+        entry = self._live(key, now)
+        if entry is not None:
+            return self._hit(key, entry, "exact", 1.0)
+
+        if not _NEGATION_RE.search(message):
+            grams = content_bigrams(normalized)
+            numbers = tuple(_DIGITS_RE.findall(normalized))
+            candidates = set().union(*(self._by_gram.get(gram, ()) for gram in grams)) if grams else set()
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                entry = self._live(candidate, now)
+                if entry is None or not entry.fuzzy or entry.context != context or entry.numbers != numbers:
+                    continue
+                score = dice(grams, entry.grams)
+                if score > best_score:
+                    best_key, best_score = candidate, score
+            if best_key is not None and best_score >= self.threshold:
+                return self._hit(best_key, self._entries[best_key], "fuzzy", best_score)
+
+        self.stats["misses"] += 1
+        CHAT_RESPONSE_CACHE.inc(result="miss")
+        return None
+
+    def store(
+        self, message: str, history: list[ChatMessage], payload: dict, latency: float, notes: Optional[str] = None
+    ) -> None:
+        if not self.is_cacheable(message, history, notes):
+            return
+        normalized = normalize_text(message)
+        context = _context_key(history, notes)
+        key = context + "\x00" + normalized
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(
+            context=context,
+            grams=content_bigrams(normalized),
+            numbers=tuple(_DIGITS_RE.findall(normalized)),
+            fuzzy=not _NEGATION_RE.search(message),
+            # 呼び出し側が後でdoneのデータを書き換えてもキャッシュに影響しないようにコピーを持つ
+            payload=copy.deepcopy(payload),
+            latency=latency,
+            stored_at=time.monotonic(),
+        )
+        self._entries[key] = entry
+        for gram in entry.grams:
+            self._by_gram.setdefault(gram, set()).add(key)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> dict:
+        """監視用の統計情報"""
+        hits = self.stats["exact_hits"] + self.stats["fuzzy_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_seconds": round(self.stats["saved_seconds"], 3),
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _live(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and now - entry.stored_at > self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _hit(self, key: str, entry: _Entry, match: str, score: float) -> CachedResponse:
+        self._entries.move_to_end(key)
+        self.stats[f"{match}_hits"] += 1
+        self.stats["saved_seconds"] += entry.latency
+        CHAT_RESPONSE_CACHE.inc(result=match)
+        CHAT_RESPONSE_CACHE_SAVED_SECONDS.inc(entry.latency)
+        return CachedResponse(payload=copy.deepcopy(entry.payload), match=match, score=score, latency=entry.latency)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._by_gram.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_gram[gram]
+
+
+def _context_key(history: list[ChatMessage], notes: Optional[str] = None) -> str:
+    turns = (f"{msg.role}:{normalize_text(msg.content)}" for msg in history)
+    return "\x01".join([f"notes:{normalize_text(notes or '')}", *turns])
+
+
+@lru_cache
+def get_response_cache() -> Optional[ResponseCache]:
+    """設定に基づいてアプリ共有の応答キャッシュを返す（無効ならNone）"""
+    settings = get_settings()
+    if not settings.chat_response_cache_enabled:
+        return None
+    return ResponseCache(
+        max_entries=settings.chat_response_cache_max_entries,
+        ttl=settings.chat_response_cache_ttl,
+        threshold=settings.chat_response_cache_similarity,
+        max_history=settings.chat_response_cache_max_history,
+    )
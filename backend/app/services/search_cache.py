@@ -0,0 +1,273 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, Protocol
+from app.config import get_settings
+from app.schemas.book import MAX_SEARCH_COUNT, BookSearchParams, BookSearchResponse
+
+KEY_PREFIX = "cinii:search:"
+
+
+def make_search_key(params: BookSearchParams) -> str:
+    """検索パラメータを正規化してキャッシュキーにする
+
+    文字列はtrim + casefold、countは上限で丸め、未指定(None/空文字)の項目は除外する。
+    """
+    normalized = {}
+    for field, value in params.model_dump().items():
+        if isinstance(value, str):
+            value = value.strip().casefold()
+            if not value:
+                continue
+        if value is None:
+            continue
+        normalized[field] = value
+    normalized["count"] = max(1, min(params.count, MAX_SEARCH_COUNT))
+    return KEY_PREFIX + json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class SharedCacheBackend(Protocol):
+    """2段目の共有キャッシュ（Redis互換）のインターフェース"""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class InMemorySharedBackend:
+    """共有キャッシュのローカル代替（テスト・開発用）"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data[key] = (value, time.time() + ttl)
+
+    async def aclose(self) -> None:
+        self._data.clear()
+
+
+class RedisSharedBackend:
+    """Redis互換サーバーを使う共有キャッシュ"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("SEARCH_CACHE_REDIS_URL を使うには redis パッケージが必要です") from e
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+@dataclass
+class _Entry:
+    value: BookSearchResponse
+    payload: bytes  # 共有キャッシュに保存するJSON（サイズ計算にも使う）
+    stored_at: float  # time.time()
+    ttl: float
+
+
+@dataclass
+class CacheLookup:
+    value: BookSearchResponse
+    stale: bool
+
+
+class SearchCache:
+    """CiNii検索結果の2段キャッシュ（LRU + TTL + stale-while-revalidate）"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 600.0,
+        stale_ttl: float = 300.0,
+        negative_ttl: float = 60.0,
+        shared: Optional[SharedCacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "fallback_hits": 0,
+        }
+
+    async def get(self, key: str) -> Optional[CacheLookup]:
+        """キャッシュを引く。期限切れでもstale期間内なら stale=True で返す"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry.stored_at > entry.ttl + self.stale_ttl:
+                # 期限切れでも障害時のフォールバック用に残し、LRUで追い出されるのに任せる
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.shared is not None:
+            entry = await self._get_shared(key, now)
+            if entry is not None:
+                self.stats["shared_hits"] += 1
+                self._store(key, entry)
+
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        stale = now - entry.stored_at > entry.ttl
+        if stale:
+            self.stats["stale_hits"] += 1
+        else:
+            self.stats["hits"] += 1
+        if not entry.value.books:
+            self.stats["negative_hits"] += 1
+        return CacheLookup(value=entry.value, stale=stale)
+
+    def contains(self, key: str) -> bool:
+        """1段目に期限内のエントリがあるか（統計に数えない）"""
+        entry = self._entries.get(key)
+        return entry is not None and time.time() - entry.stored_at <= entry.ttl
+
+    async def get_fallback(self, key: str) -> Optional[BookSearchResponse]:
+        """CiNiiが使えないとき用に、期限を問わず残っている値を返す"""
+        entry = self._entries.get(key)
+        if entry is None and self.shared is not None:
+            entry = await self._get_shared(key, time.time(), ignore_expiry=True)
+        if entry is None:
+            return None
+        self.stats["fallback_hits"] += 1
+        return entry.value
+
+    async def set(self, key: str, value: BookSearchResponse) -> None:
+        """検索結果を保存する。0件の結果は短いTTLでネガティブキャッシュする"""
+        ttl = self.ttl if value.books else self.negative_ttl
+        entry = _Entry(
+            value=value,
+            payload=value.model_dump_json().encode(),
+            stored_at=time.time(),
+            ttl=ttl,
+        )
+        self._store(key, entry)
+        if self.shared is not None:
+            envelope = json.dumps({"stored_at": entry.stored_at, "ttl": ttl}).encode()
+            await self.shared.set(key, envelope + b"\n" + entry.payload, ttl + self.stale_ttl)
+
+    def schedule_refresh(self, key: str, fetch: Callable[[], Awaitable[BookSearchResponse]]) -> None:
+        """staleなエントリをバックグラウンドで再取得する（同じキーの再取得は1本だけ）
+
+        fetch は取得した結果を自分でキャッシュに保存する（ここでは保存しない）。
+        """
+        if key in self._refreshing:
+            return
+
+        async def _refresh():
+            try:
+                await fetch()
+                self.stats["refreshes"] += 1
+            except Exception:
+                # 再取得の失敗はstaleな値を返し続けるだけにする
+                self.stats["refresh_errors"] += 1
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(_refresh())
+
+    def snapshot(self) -> dict:
+        """監視用の統計情報"""
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": (lookups - self.stats["misses"]) / lookups if lookups else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.shared is not None:
+            await self.shared.aclose()
+
+    async def _get_shared(self, key: str, now: float, ignore_expiry: bool = False) -> Optional[_Entry]:
+        raw = await self.shared.get(key)
+        if not raw:
+            return None
+        envelope, _, payload = raw.partition(b"\n")
+        meta = json.loads(envelope)
+        if not ignore_expiry and now - meta["stored_at"] > meta["ttl"] + self.stale_ttl:
+            return None
+        return _Entry(
+            value=BookSearchResponse.model_validate_json(payload),
+            payload=payload,
+            stored_at=meta["stored_at"],
+            ttl=meta["ttl"],
+        )
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.payload)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.payload)
+
+
+@lru_cache
+def get_search_cache() -> Optional[SearchCache]:
+    """設定に基づいてアプリ共有の検索キャッシュを返す（無効ならNone）"""
+    settings = get_settings()
+    if not settings.search_cache_enabled:
+        return None
+    shared = RedisSharedBackend(settings.search_cache_redis_url) if settings.search_cache_redis_url else None
+    return SearchCache(
+        max_entries=settings.search_cache_max_entries,
+        max_bytes=settings.search_cache_max_bytes,
+        ttl=settings.search_cache_ttl,
+        stale_ttl=settings.search_cache_stale_ttl,
+        negative_ttl=settings.search_cache_negative_ttl,
+        shared=shared,
+    )
@@ -0,0 +1,191 @@
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Protocol
+from app.config import get_settings
+from app.schemas.chat import ChatMessage
+from app.services.history import summarize_turn
+
+NOTES_MAX_BOOKS = 20  # システムメッセージで渡す紹介済みの本の上限
+
+
+@dataclass
+class Session:
+    """サーバー側に保存する会話の状態"""
+
+    id: str
+    created_at: float
+    updated_at: float
+    messages: list[dict] = field(default_factory=list)  # {"role", "content"}
+    books: list[dict] = field(default_factory=list)  # 紹介済みの本（新しい順・ID重複なし）
+    summary: list[str] = field(default_factory=list)  # 上限を超えた古いターンの要約メモ
+    omitted_turns: int = 0  # 要約メモからも溢れたターン数
+
+    @classmethod
+    def new(cls) -> "Session":
+        now = time.time()
+        return cls(id=secrets.token_urlsafe(16), created_at=now, updated_at=now)
+
+    def history(self) -> list[ChatMessage]:
+        """build_messages に渡す履歴（保存時に作った値なので再検証しない）"""
+        return [ChatMessage.model_construct(role=msg["role"], content=msg["content"]) for msg in self.messages]
+
+    def notes(self) -> Optional[str]:
+        """保存済みの要約と紹介済みの本を、LLMに渡すシステムメッセージにする"""
+        parts = []
+        if self.summary:
+            header = "## これまでの会話の要約"
+            if self.omitted_turns:
+                header += f"（さらに古い{self.omitted_turns}件は省略）"
+            parts.append("\n".join([header, *self.summary]))
+        if self.books:
+            lines = [f"- {book['id']}: {book['title']}" for book in self.books[:NOTES_MAX_BOOKS]]
+            header = "## これまでに紹介した本（ユーザーがこれらに言及した場合は再検索せずに参照してください）"
+            parts.append("\n".join([header, *lines]))
+        return "\n\n".join(parts) or None
+
+    def record_turn(
+        self,
+        message: str,
+        answer: str,
+        books: Optional[list[dict]],
+        max_messages: int,
+        max_books: int,
+        memo_chars: int,
+        memo_max_lines: int = 10,
+    ) -> None:
+        """1ターン分の発言と検索結果を追加し、上限を超えた分を要約メモに移す"""
+        self.messages.append({"role": "user", "content": message})
+        self.messages.append({"role": "assistant", "content": answer})
+        overflow = max(0, len(self.messages) - max_messages)
+        if overflow:
+            self.summary.extend(summarize_turn(turn, memo_chars) for turn in self.messages[:overflow])
+            del self.messages[:overflow]
+            if len(self.summary) > memo_max_lines:
+                self.omitted_turns += len(self.summary) - memo_max_lines
+                del self.summary[:-memo_max_lines]
+
+        if books:
+            new_ids = {book["id"] for book in books}
+            self.books = [*books, *(book for book in self.books if book["id"] not in new_ids)][:max_books]
+        self.updated_at = time.time()
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str | bytes) -> "Session":
+        return cls(**json.loads(data))
+
+
+class SessionStore(Protocol):
+    """セッションの保存先のインターフェース（複数ワーカーで共有するならプロセス外に保存する）"""
+
+    ttl: float
+
+    async def get(self, session_id: str) -> Optional[Session]: ...
+
+    async def save(self, session: Session) -> None: ...
+
+    async def delete(self, session_id: str) -> bool: ...
+
+    async def aclose(self) -> None: ...
+
+
+class InMemorySessionStore:
+    """プロセス内のセッションストア（テスト・単一ワーカー用。LRUで max_sessions 件まで）"""
+
+    def __init__(self, ttl: float, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # 呼び出し側での変更が保存前に見えないよう、JSONで持つ
+        self._data: OrderedDict[str, str] = OrderedDict()
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        data = self._data.get(session_id)
+        if data is None:
+            return None
+        session = Session.from_json(data)
+        if time.time() - session.updated_at > self.ttl:
+            del self._data[session_id]
+            return None
+        self._data.move_to_end(session_id)
+        return session
+
+    async def save(self, session: Session) -> None:
+        self._data[session.id] = session.to_json()
+        self._data.move_to_end(session.id)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._data.pop(session_id, None) is not None
+
+    async def aclose(self) -> None:
+        self._data.clear()
+
+
+class SQLiteSessionStore:
+    """SQLiteファイルに保存するセッションストア（同じホストの複数ワーカーで共有できる）
+
+    1件の読み書きは1ミリ秒程度なので、BookIndexと同様にイベントループ上で同期的に呼び出す。
+    同じセッションへの同時の書き込みは後勝ちになる。
+    """
+
+    PURGE_EVERY = 256  # この回数の保存ごとに期限切れの行を消す
+
+    def __init__(self, path: str, ttl: float):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._saves = 0
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions(expires_at)")
+        self._conn.commit()
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+            ).fetchone()
+        return Session.from_json(row[0]) if row else None
+
+    async def save(self, session: Session) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                (session.id, session.to_json(), session.updated_at + self.ttl),
+            )
+            self._saves += 1
+            if self._saves % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    async def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    async def aclose(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache
+def get_session_store() -> SessionStore:
+    """設定に基づいてアプリ共有のセッションストアを返す"""
+    settings = get_settings()
+    if settings.session_store == "sqlite":
+        return SQLiteSessionStore(settings.session_store_path, settings.session_ttl)
+    return InMemorySessionStore(settings.session_ttl, settings.session_max_sessions)
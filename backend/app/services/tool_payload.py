@@ -0,0 +1,52 @@
+import json
+from typing import Literal
+from app.schemas.book import Book
+
+ToolResultFormat = Literal["json", "minimal", "table"]
+
+# LLMが推薦に使う項目（cinii_url・isbnは推薦文に不要なので送らない）
+# idは過去ラウンドの結果やセッションのメモが {id, title} で本を参照するので残す
+LLM_BOOK_FIELDS = ("id", "title", "authors", "publisher", "year", "owner_count", "description", "subjects")
+
+
+def encode_search_result(total: int, books: list[Book], fmt: ToolResultFormat) -> str:
+    """search_booksの結果をLLM向けのtool結果文字列にする
+
+    - json: Bookの全項目（従来の形式）
+    - minimal: 推薦に使う項目だけに絞り、nullは省く
+    - table: 列名を1回だけ書き、各本は値の配列にする
+    """
+    if fmt == "json":
+        return json.dumps({"total": total, "books": [book.model_dump() for book in books]}, ensure_ascii=False)
+    if fmt == "minimal":
+        payload = {"total": total, "books": [_project(book) for book in books]}
+    elif fmt == "table":
+        columns = [
+            field for field in LLM_BOOK_FIELDS
+            if any(getattr(book, field) is not None for book in books)
+        ]
+        payload = {
+            "total": total,
+            "columns": columns,
+            "rows": [[_cell(getattr(book, field)) for field in columns] for book in books],
+        }
+    else:
+        raise ValueError(f"Unknown tool result format: {fmt}")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _project(book: Book) -> dict:
+    record = {}
+    for field in LLM_BOOK_FIELDS:
+        value = getattr(book, field)
+        if value is None or value == []:
+            continue
+        record[field] = value
+    return record
+
+
+def _cell(value):
+    # 表形式では著者リストを1つの文字列にまとめる
+    if isinstance(value, list):
+        return " / ".join(value)
+    return value
@@ -0,0 +1,120 @@
+"""記録済みレスポンスを返すCiNii Books OpenSearch APIのスタブサーバー
+
+uv run python -m benchmarks.cinii_stub_server --port 8766 --latency 0.2 --rate-limit-ratio 0.02
+
+CINII_API_URL=http://127.0.0.1:8766/books/opensearch/search を設定すれば、アプリ全体をスタブ相手に動かせる。
+fixtures/ のJSON-LDをクエリごとに決まった1つ選び、count・p（ページ）に合わせて items を切り出して返す。
+書誌レコード（/ncid/{NCID}.json）は fixtures/record_BB97299752.json のIDを差し替えて返す
+（CINII_RECORD_BASE_URL=http://127.0.0.1:8766/ncid/ で書誌詳細の補完に使える）。
+--rate-limit-ratio の割合で429（--retry-after 秒のRetry-After付き）を返す。
+"""
+import argparse
+import asyncio
+import copy
+import json
+import random
+import zlib
+from pathlib import Path
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+RECORD_FIXTURE = "record_BB97299752.json"
+
+
+def load_fixtures() -> list[dict]:
+    return [json.loads(path.read_text()) for path in sorted(FIXTURES_DIR.glob("cinii_*.json"))]
+
+
+def replay(fixture: dict, count: int, page: int) -> dict:
+    """記録済みレスポンスから、指定ページ分の items を（足りなければ繰り返して）切り出す"""
+    channel = fixture["@graph"][0]
+    items = channel["items"]
+    start = (page - 1) * count
+    selected = []
+    for i in range(start, start + count):
+        item = copy.copy(items[i % len(items)])
+        if i >= len(items):
+            # 繰り返した分は別の本として扱われるようIDをずらす
+            item["@id"] = f"{item['@id']}-{i // len(items)}"
+        selected.append(item)
+    return {
+        **fixture,
+        "@graph": [{
+            **channel,
+            "opensearch:startIndex": str(start + 1),
+            "opensearch:itemsPerPage": str(count),
+            "items": selected,
+        }],
+    }
+
+
+def create_app(
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit_ratio: float = 0.0,
+    retry_after: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI()
+    fixtures = load_fixtures()
+    record = json.loads((FIXTURES_DIR / RECORD_FIXTURE).read_text())
+    rng = random.Random(seed)
+    stats = {"requests": 0, "rate_limited": 0}
+
+    async def delay_or_reject() -> Response | None:
+        stats["requests"] += 1
+        await asyncio.sleep(latency + rng.uniform(0, jitter))
+        if rng.random() < rate_limit_ratio:
+            stats["rate_limited"] += 1
+            headers = {"Retry-After": f"{retry_after:g}"} if retry_after else {}
+            return Response(status_code=429, headers=headers)
+        return None
+
+    @app.get("/books/opensearch/search")
+    async def search(request: Request):
+        if (rejected := await delay_or_reject()) is not None:
+            return rejected
+
+        params = request.query_params
+        key = "|".join(params.get(name, "") for name in ("q", "title", "author", "publisher"))
+        fixture = fixtures[zlib.crc32(key.encode()) % len(fixtures)]
+        count = int(params.get("count", 20))
+        page = int(params.get("p", 1))
+        body = json.dumps(replay(fixture, count, page), ensure_ascii=False).encode()
+        return Response(body, media_type="application/json")
+
+    @app.get("/ncid/{record_file}")
+    async def get_record(record_file: str):
+        if (rejected := await delay_or_reject()) is not None:
+            return rejected
+        ncid = record_file.removesuffix(".json")
+        entity = {**record["@graph"][0], "@id": f"https://ci.nii.ac.jp/ncid/{ncid}#entity"}
+        body = json.dumps({**record, "@graph": [entity]}, ensure_ascii=False).encode()
+        return Response(body, media_type="application/json")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延に加える0〜jitter秒の揺らぎ")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="429を返す割合（0〜1）")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="429に付けるRetry-After秒（0なら付けない）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.jitter, args.rate_limit_ratio, args.retry_after, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""デバッグログ（logイベント）の有無による1リクエストあたりのCPU時間の比較
+
+OpenAIはSDKを通さないスタブ（StubOpenAI）に置き換え、アプリ側の処理だけを測る。
+
+uv run python -m benchmarks.debug_logs
+"""
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("CINII_APP_ID", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+# スタブ相手なのでレート制限で待たないようにする
+os.environ["CINII_RATE_LIMIT"] = os.environ["CINII_RATE_LIMIT_MAX"] = "100000"
+os.environ["CINII_RATE_LIMIT_BURST"] = "100000"
+
+from app.services import chat  # noqa: E402
+from benchmarks.stubs import StubOpenAI, stub_cinii_client  # noqa: E402
+
+REQUESTS = 300
+CONCURRENCY = 30
+REPEATS = 3
+
+
+async def run(debug: bool, cinii_client, openai_client) -> tuple[float, float, int]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    events = 0
+
+    async def one(i: int) -> None:
+        nonlocal events
+        async with semaphore:
+            # ルーターと同じくSSEの1行に直すところまで含める
+            async for event in chat.process_chat_stream(
+                f"質問{i % 50}", [], cinii_client, openai_client, debug=debug
+            ):
+                f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                events += 1
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    return time.process_time() - cpu_start, time.perf_counter() - wall_start, events
+
+
+async def main():
+    openai_client = StubOpenAI()
+    async with stub_cinii_client(latency=0.0) as cinii_client:
+        await run(True, cinii_client, openai_client)  # ウォームアップ
+        # 交互に数回実行し、各設定で最小のCPU時間を採用する（ノイズ対策）
+        results: dict[bool, tuple[float, float, int]] = {}
+        for _ in range(REPEATS):
+            for debug in [True, False]:
+                measured = await run(debug, cinii_client, openai_client)
+                if debug not in results or measured[0] < results[debug][0]:
+                    results[debug] = measured
+        for debug, (cpu, wall, events) in results.items():
+            print(
+                f"debug={str(debug):5}: {cpu / REQUESTS * 1000:.2f} ms CPU/request, "
+                f"{REQUESTS / wall:.0f} req/s, {events / REQUESTS:.1f} events/request "
+                f"(concurrency={CONCURRENCY})"
+            )
+        saved = results[True][0] - results[False][0]
+        print(f"saved: {saved / REQUESTS * 1000:.2f} ms CPU/request ({saved / results[True][0]:.0%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
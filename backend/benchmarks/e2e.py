@@ -0,0 +1,318 @@
+"""/books/search・/chat・/chat/stream のエンドツーエンド負荷ベンチマーク（CiNii・OpenAIはローカルスタブ）
+
+uv run python -m benchmarks.e2e --requests 200 --concurrency 20
+uv run python -m benchmarks.e2e --rate-limit-ratio 0.05 --output /tmp/e2e-429.json
+uv run python -m benchmarks.e2e --compare benchmarks/results/e2e-<commit>.json
+
+CiNii・OpenAIのスタブサーバーとアプリ（uvicorn、1ワーカー）を子プロセスで起動し、シナリオごとに
+スループット、レイテンシのp50/p95/p99、SSEの最初のイベントまでの時間（TTFE）、
+同時接続1本あたりのメモリ増分（アプリのRSSのピーク - 開始時、Linuxのみ）を計測する。
+結果はキーを固定したJSON（schema_version）で保存し、--compare で以前のコミットの結果と比べられる。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+import httpx
+
+SCHEMA_VERSION = 1
+RESULTS_DIR = Path(__file__).parent / "results"
+OPENAI_PORT = 8765
+CINII_PORT = 8766
+APP_PORT = 8767
+SCENARIOS = ("books_search", "chat", "chat_stream")
+WARMUP_REQUESTS = 10
+
+# 外部サービスの代わりにスタブを使い、アプリ側の制限が計測のボトルネックにならないようにする
+# （環境変数で指定されていればそちらを優先する）
+APP_ENV_DEFAULTS = {
+    "CINII_APP_ID": "benchmark",
+    "CINII_RATE_LIMIT": "1000",
+    "CINII_RATE_LIMIT_MAX": "1000",
+    "CINII_RATE_LIMIT_BURST": "1000",
+    "SEARCH_CACHE_ENABLED": "false",
+    "CHAT_RESPONSE_CACHE_ENABLED": "false",
+    "BOOK_INDEX_MODE": "off",
+}
+
+
+async def send_books_search(client: httpx.AsyncClient, i: int) -> Optional[float]:
+    response = await client.post("/books/search", json={"query": f"哲学 入門 {i}", "count": 20})
+    response.raise_for_status()
+    return None
+
+
+async def send_chat(client: httpx.AsyncClient, i: int) -> Optional[float]:
+    response = await client.post("/chat", json={"message": f"哲学の入門書を探しています（{i}）"})
+    response.raise_for_status()
+    if not response.json()["books"]:
+        raise RuntimeError("no books in response")
+    return None
+
+
+async def send_chat_stream(client: httpx.AsyncClient, i: int) -> Optional[float]:
+    """最初のイベントまでの秒数を返す（doneが届かなければエラー）"""
+    started = time.perf_counter()
+    first_event = None
+    done = False
+    async with client.stream("POST", "/chat/stream", json={"message": f"哲学の入門書を探しています（{i}）"}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            if first_event is None:
+                first_event = time.perf_counter() - started
+            event = json.loads(line[6:])
+            if event["type"] == "error":
+                raise RuntimeError(event["data"]["message"])
+            done = done or event["type"] == "done"
+    if not done:
+        raise RuntimeError("stream ended without done")
+    return first_event
+
+
+SENDERS = {
+    "books_search": send_books_search,
+    "chat": send_chat,
+    "chat_stream": send_chat_stream,
+}
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """プロセスのRSS（バイト）。/proc がなければNone"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentiles(values: list[float]) -> Optional[dict]:
+    """p50/p95/p99（ミリ秒、nearest-rank）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+async def run_scenario(name: str, requests: int, concurrency: int, app_pid: int) -> dict:
+    send = SENDERS[name]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", limits=limits, timeout=120) as client:
+        for i in range(WARMUP_REQUESTS):
+            await send(client, -1 - i)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        ttfes: list[float] = []
+        errors: dict[str, int] = {}
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    ttfe = await send(client, i)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                if ttfe is not None:
+                    ttfes.append(ttfe)
+
+        baseline = read_rss(app_pid)
+        peak = baseline
+        running = True
+
+        async def sample_rss() -> None:
+            nonlocal peak
+            while running:
+                rss = read_rss(app_pid)
+                if rss is not None and (peak is None or rss > peak):
+                    peak = rss
+                await asyncio.sleep(0.02)
+
+        sampler = asyncio.create_task(sample_rss())
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall = time.perf_counter() - wall_start
+        running = False
+        await sampler
+
+    memory = None
+    if baseline is not None and peak is not None:
+        memory = {
+            "rss_baseline_mb": round(baseline / 2**20, 2),
+            "rss_peak_mb": round(peak / 2**20, 2),
+            "per_connection_kb": round((peak - baseline) / 1024 / concurrency, 2),
+        }
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_types": dict(sorted(errors.items())),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "latency_ms": percentiles(latencies),
+        "ttfe_ms": percentiles(ttfes),
+        "memory": memory,
+    }
+
+
+def start_process(args: list[str], port: int, env: Optional[dict] = None) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, *args], env=env)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{args} exited with {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{args} did not start")
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+        return commit + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(result: dict) -> None:
+    for name, scenario in result["scenarios"].items():
+        latency = scenario["latency_ms"] or {}
+        line = (
+            f"{name:13}: {scenario['throughput_rps']:7.1f} req/s, "
+            f"p50 {latency.get('p50', 0):7.1f} ms, p95 {latency.get('p95', 0):7.1f} ms, p99 {latency.get('p99', 0):7.1f} ms, "
+            f"errors {scenario['errors']}"
+        )
+        if scenario["ttfe_ms"]:
+            line += f", TTFE p50 {scenario['ttfe_ms']['p50']:.1f} ms"
+        if scenario["memory"]:
+            line += f", {scenario['memory']['per_connection_kb']:.0f} KB/conn"
+        print(line)
+
+
+def compare(base: dict, current: dict) -> None:
+    """2つの結果の主要な指標を並べて、変化率を表示する"""
+    print(f"base {base['commit']} ({base['timestamp']}) → current {current['commit']} ({current['timestamp']})")
+    for name, scenario in current["scenarios"].items():
+        before = base["scenarios"].get(name)
+        if before is None:
+            continue
+        rows = [("throughput_rps", before["throughput_rps"], scenario["throughput_rps"])]
+        for group in ("latency_ms", "ttfe_ms"):
+            for q in ("p50", "p95", "p99"):
+                if before[group] and scenario[group]:
+                    rows.append((f"{group}.{q}", before[group][q], scenario[group][q]))
+        if before["memory"] and scenario["memory"]:
+            rows.append(("per_connection_kb", before["memory"]["per_connection_kb"], scenario["memory"]["per_connection_kb"]))
+        print(f"[{name}]")
+        for label, old, new in rows:
+            change = f"{(new - old) / old * 100:+6.1f}%" if old else "     -"
+            print(f"  {label:18} {old:10.2f} → {new:10.2f}  {change}")
+
+
+async def run_all(scenarios: list[str], requests: int, concurrency: int, app_pid: int) -> dict:
+    results = {}
+    for name in scenarios:
+        results[name] = await run_scenario(name, requests, concurrency, app_pid)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="カンマ区切り: " + ",".join(SCENARIOS))
+    parser.add_argument("--cinii-latency", type=float, default=0.05)
+    parser.add_argument("--cinii-jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="CiNiiスタブが429を返す割合")
+    parser.add_argument("--openai-latency", type=float, default=0.05)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="OpenAIスタブのチャンク間の遅延（秒）")
+    parser.add_argument("--output", type=Path, help="結果のJSON（省略時は benchmarks/results/e2e-<commit>.json）")
+    parser.add_argument("--compare", type=Path, help="比較対象の以前の結果")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    env = {
+        **APP_ENV_DEFAULTS,
+        **os.environ,
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{OPENAI_PORT}/v1",
+        "CINII_API_URL": f"http://127.0.0.1:{CINII_PORT}/books/opensearch/search",
+    }
+    processes = []
+    try:
+        processes.append(start_process(
+            ["-m", "benchmarks.openai_stub_server", "--port", str(OPENAI_PORT),
+             "--latency", str(args.openai_latency), "--chunk-delay", str(args.chunk_delay)],
+            OPENAI_PORT,
+        ))
+        processes.append(start_process(
+            ["-m", "benchmarks.cinii_stub_server", "--port", str(CINII_PORT),
+             "--latency", str(args.cinii_latency), "--jitter", str(args.cinii_jitter),
+             "--rate-limit-ratio", str(args.rate_limit_ratio)],
+            CINII_PORT,
+        ))
+        app = start_process(
+            ["-m", "uvicorn", "app.main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+            APP_PORT,
+            env,
+        )
+        processes.append(app)
+        scenario_results = asyncio.run(run_all(scenarios, args.requests, args.concurrency, app.pid))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    result = {
+        "schema_version": SCHEMA_VERSION,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cinii_latency": args.cinii_latency,
+            "cinii_jitter": args.cinii_jitter,
+            "rate_limit_ratio": args.rate_limit_ratio,
+            "openai_latency": args.openai_latency,
+            "chunk_delay": args.chunk_delay,
+        },
+        "scenarios": scenario_results,
+    }
+    print_results(result)
+    output = args.output or RESULTS_DIR / f"e2e-{result['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+    print(f"saved: {output}")
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), result)
+
+
+if __name__ == "__main__":
+    main()
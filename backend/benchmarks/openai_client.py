@@ -0,0 +1,119 @@
+"""OpenAIクライアントの使い方による負荷時の性能比較（ローカルのスタブサーバー相手）
+
+- per_request: リクエストごとに AsyncOpenAI を作り、SDKの create() で呼ぶ（従来の実装）
+- shared: 共有クライアント（create_openai_client）で create_chat_stream() を呼ぶ（アプリと同じ）
+
+uv run python -m benchmarks.openai_client
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from openai import AsyncOpenAI
+
+os.environ.setdefault("CINII_APP_ID", "benchmark")
+
+from app.config import Settings, get_settings  # noqa: E402
+from app.services.chat import CHAT_TOOLS, STREAM_OPTIONS, SYSTEM_PROMPT, create_chat_stream  # noqa: E402
+from app.services.http_client import create_openai_client  # noqa: E402
+
+PORT = 8765
+REQUESTS = 400
+CONCURRENCY = 50
+LATENCY = 0.05
+
+
+def make_body(i: int) -> dict:
+    return {
+        "model": get_settings().chat_model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"哲学の入門書を探しています（{i}）"},
+        ],
+        "tools": CHAT_TOOLS,
+        "tool_choice": "none",
+        "stream": True,
+        "stream_options": STREAM_OPTIONS,
+    }
+
+
+async def call_per_request(base_url: str, body: dict) -> None:
+    async with AsyncOpenAI(api_key="stub", base_url=base_url) as client:
+        stream = await client.chat.completions.create(**body)
+        async for _ in stream:
+            pass
+
+
+async def run(name: str, call) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call(make_body(i))
+            latencies.append(time.perf_counter() - started)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    print(
+        f"{name:12}: {REQUESTS / wall:6.0f} req/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.1f} ms, "
+        f"{cpu / REQUESTS * 1000:.2f} ms CPU/request"
+    )
+
+
+def start_stub_server() -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.openai_stub_server", "--port", str(PORT), "--latency", str(LATENCY)],
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", PORT), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("stub server did not start")
+
+
+async def main():
+    base_url = f"http://127.0.0.1:{PORT}/v1"
+    shared = create_openai_client(Settings(openai_api_key="stub", openai_base_url=base_url))
+    print(f"{REQUESTS} requests, concurrency={CONCURRENCY}, stub latency={LATENCY * 1000:.0f} ms")
+    try:
+        async def call_shared(body: dict) -> None:
+            async for _ in await create_chat_stream(shared, body, 30.0):
+                pass
+
+        await run("warmup", call_shared)
+        await run("per_request", lambda body: call_per_request(base_url, body))
+        await run("shared", call_shared)
+
+        # 先頭部分が毎回同じなので、2回目以降はプロンプトキャッシュ対象になる
+        usage = None
+        async for chunk in await create_chat_stream(shared, make_body(0), 30.0):
+            usage = chunk.usage or usage
+        cached = usage.prompt_tokens_details.cached_tokens
+        note = "" if cached else "（先頭部分が1024トークン未満のためキャッシュ対象外）"
+        print(f"prompt_tokens={usage.prompt_tokens}, cached_tokens={cached}{note}")
+    finally:
+        await shared.close()
+
+
+if __name__ == "__main__":
+    server = start_stub_server()
+    try:
+        asyncio.run(main())
+    finally:
+        server.terminate()
+        server.wait()
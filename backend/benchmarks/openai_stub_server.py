@@ -0,0 +1,78 @@
+"""ローカルで動かすOpenAI Chat Completions API（ストリーミング）のスタブサーバー
+
+uv run python -m benchmarks.openai_stub_server --port 8765 --latency 0.05
+
+OPENAI_BASE_URL=http://127.0.0.1:8765/v1 を設定すれば、アプリ全体をスタブ相手に動かせる。
+プロンプトキャッシュを模して、同じ先頭部分（ツール定義 + systemメッセージ）を2回目以降に受け取ると
+その分を usage.prompt_tokens_details.cached_tokens として返す。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from benchmarks.stubs import chat_completion_sse, stub_reply
+
+# OpenAIのキャッシュは1024トークン以上・128トークン単位で効く
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+def create_app(latency: float = 0.0, chunk_delay: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    seen_prefixes: set[str] = set()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        raw = await request.body()
+        body = json.loads(raw)
+        await asyncio.sleep(latency)
+
+        # トークン数はおおよそ4バイト=1トークンで見積もる
+        prompt_tokens = len(raw) // 4
+        prefix = json.dumps([body.get("tools"), body["messages"][:1]], ensure_ascii=False, sort_keys=True)
+        prefix_tokens = len(prefix.encode()) // 4
+        digest = hashlib.sha256(prefix.encode()).hexdigest()
+        cached_tokens = 0
+        if digest in seen_prefixes and prefix_tokens >= CACHE_MIN_TOKENS:
+            cached_tokens = prefix_tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+        seen_prefixes.add(digest)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 60,
+            "total_tokens": prompt_tokens + 60,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        payload = chat_completion_sse(stub_reply(body), usage)
+        if not body.get("stream"):
+            return Response(status_code=400, content=b'{"error": "only stream=true is supported"}')
+        if not chunk_delay:
+            return Response(payload, media_type="text/event-stream")
+
+        async def events():
+            for event in payload.split(b"\n\n"):
+                if event:
+                    yield event + b"\n\n"
+                    await asyncio.sleep(chunk_delay)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="最初のチャンクまでの遅延（秒）")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="チャンク間の遅延（秒）")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.chunk_delay), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""1ターン内の複数search_books呼び出しの逐次実行と並列実行の比較
+
+uv run python -m benchmarks.parallel_tools
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("CINII_APP_ID", "benchmark")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+
+from app.services.chat import execute_search_calls  # noqa: E402
+from benchmarks.stubs import stub_cinii_client  # noqa: E402
+
+LATENCY = 0.2
+CALLS = [{"author": name, "count": 10} for name in ["村上春樹", "東野圭吾", "宮部みゆき"]]
+
+
+async def main():
+    client = stub_cinii_client(LATENCY)
+    async with client:
+        for concurrency in [1, len(CALLS)]:
+            start = time.perf_counter()
+            results = await execute_search_calls(CALLS, client, concurrency)
+            elapsed = time.perf_counter() - start
+            print(f"concurrency={concurrency}: {elapsed * 1000:.0f} ms ({len(results)} calls, {LATENCY * 1000:.0f} ms each)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
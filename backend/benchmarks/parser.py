@@ -0,0 +1,76 @@
+"""CiNiiレスポンスのパース性能（記録済みCiNiiレスポンスを使用）
+
+JSONデコード（標準ライブラリ / orjson）と、Bookの組み立て（キーワード引数での検証 / model_construct / アプリと同じ model_validate）を
+それぞれ計測し、items/sec と1レスポンスあたりのメモリ確保量を表示する。
+
+uv run python -m benchmarks.parser
+"""
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from app.schemas.book import Book
+from app.services import json_backend
+from app.services.cinii import _extract_book_fields, _parse_cinii_response
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+MIN_SECONDS = 0.5
+
+
+def _validated_parse(data: dict) -> list[Book]:
+    """比較用: 同じ抽出結果をキーワード引数で渡して検証しながら組み立てる"""
+    items = data["@graph"][0]["items"]
+    return [Book(**fields) for fields in map(_extract_book_fields, items) if fields is not None]
+
+
+def _constructed_parse(data: dict) -> list[Book]:
+    """比較用: model_constructで組み立てる"""
+    items = data["@graph"][0]["items"]
+    return [Book.model_construct(**fields) for fields in map(_extract_book_fields, items) if fields is not None]
+
+
+def _measure(fn, payload) -> tuple[float, int, int]:
+    """(1秒あたりの実行回数, 1回あたりの確保ブロック数, 1回あたりのピークメモリ) を返す"""
+    fn(payload)  # ウォームアップ
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        fn(payload)
+        runs += 1
+    rate = runs / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn(payload)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+    return rate, blocks, peak
+
+
+def main():
+    decoders = {"json": json.loads}
+    if json_backend.orjson is not None:
+        decoders["orjson"] = json_backend.orjson.loads
+    print(f"JSON backend in use: {json_backend.JSON_BACKEND}")
+    print(f"{'fixture':<24}{'stage':<32}{'items/sec':>12}{'blocks':>10}{'peak KiB':>10}")
+    for path in sorted(FIXTURES_DIR.glob("cinii_*.json")):
+        raw = path.read_bytes()
+        data = json.loads(raw)
+        n_items = len(data["@graph"][0]["items"])
+        cases = [(f"decode ({name})", decoder, raw) for name, decoder in decoders.items()]
+        cases += [
+            ("build (Book(**fields))", _validated_parse, data),
+            ("build (model_construct)", _constructed_parse, data),
+            ("build (_parse_cinii_response)", _parse_cinii_response, data),
+        ]
+        for label, fn, payload in cases:
+            rate, blocks, peak = _measure(fn, payload)
+            print(f"{path.stem:<24}{label:<32}{rate * n_items:>12,.0f}{blocks:>10}{peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
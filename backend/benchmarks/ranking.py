@@ -0,0 +1,102 @@
+"""候補の再ランキング（rank_books）のコスト（記録済みCiNiiレスポンスから候補を水増しして使用）
+
+候補数ごとに、NumPy版とPython版それぞれについて1回あたりの時間を表示する。
+rank はタイトル・著者の正規化を済ませた候補（CiNiiのレスポンスをパースしたときに prepare_books 済み）の時間。
+prepare は prepare_books で初見の本を正規化する時間（パース時に1回だけかかる）。
+候補が NUMPY_MIN_BOOKS 件未満ならNumPyがあってもPython版で採点する（既定の20件はPython版）。
+1vCPUのVMで、1000件のNumPy版は約0.7〜1.0ミリ秒（おおむね1ミリ秒以内だが、負荷によっては超える）、20件は約0.05ミリ秒。
+正規化（prepare）は1000件で約2〜3ミリ秒かかるが、パース時に本ごとに1回だけ。
+
+uv run python -m benchmarks.ranking
+"""
+import json
+import random
+import time
+from pathlib import Path
+from app.services import ranking
+from app.services.cinii import _parse_cinii_response
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+POOL_SIZES = (20, 100, 1000)
+TOP_K = 10
+QUERY = "村上春樹 小説"
+MIN_SECONDS = 0.5
+EDITIONS = ("", " 新装版", " (講談社文庫)", " 上", " 下", " 第2版")
+
+
+def make_pool(size: int, seed: int = 0):
+    """記録済みの本を版違い・巻違いのタイトルと所蔵館数・出版年の揺らぎで size 件に増やす"""
+    rng = random.Random(seed)
+    books = []
+    for path in sorted(FIXTURES_DIR.glob("cinii_*.json")):
+        books.extend(_parse_cinii_response(json.loads(path.read_bytes())))
+    pool = []
+    for i in range(size):
+        book = books[i % len(books)]
+        pool.append(book.model_copy(update={
+            "id": f"{book.id}-{i}",
+            "title": f"{book.title}{EDITIONS[i // len(books) % len(EDITIONS)]}" + (f" {i}" if i % 3 == 0 else ""),
+            "isbn": None,
+            "owner_count": rng.randint(0, 1500),
+            "year": str(rng.randint(1950, 2025)) if i % 10 else None,
+        }))
+    return pool
+
+
+def _per_call_us(fn) -> float:
+    fn()  # ウォームアップ
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        fn()
+        runs += 1
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def _clear_caches() -> None:
+    ranking.normalize_title.cache_clear()
+    ranking.author_key.cache_clear()
+    ranking._parse_year.cache_clear()
+    ranking.query_bigrams.cache_clear()
+
+
+def _prepare_us(pool) -> float:
+    """キャッシュを空にして prepare_books を呼んだときの1回の時間（複数回の中央値）"""
+    samples = []
+    for _ in range(20):
+        _clear_caches()
+        start = time.perf_counter()
+        ranking.prepare_books(pool)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    numpy = ranking.np
+    backends = {"numpy": numpy, "python": None} if numpy is not None else {"python": None}
+    print(f"ranking backend in use: {ranking.RANKING_BACKEND}, top_k={TOP_K}, query={QUERY!r}")
+    print(f"{'pool':>6}{'backend':>9}{'rank us/call':>15}{'prepare us':>13}{'unique editions':>17}")
+    try:
+        for size in POOL_SIZES:
+            pool = make_pool(size)
+            editions = len(set(ranking.edition_keys(pool)))
+            prepare = _prepare_us(pool)
+            for name, module in backends.items():
+                ranking.np = module
+                # NUMPY_MIN_BOOKS 件未満ではどちらも同じPython版になる
+                used = name if module is None or size >= ranking.NUMPY_MIN_BOOKS else "python"
+                ranking.prepare_books(pool)
+                rank = _per_call_us(lambda: ranking.rank_books(pool, QUERY, TOP_K))
+                print(f"{size:>6}{name + ('' if used == name else '*'):>9}{rank:>15,.1f}{prepare:>13,.1f}{editions:>17}")
+    finally:
+        ranking.np = numpy
+    print(f"* {ranking.NUMPY_MIN_BOOKS}件未満なのでPython版で採点")
+
+    pool = make_pool(1000)
+    print("\ntop 5 of 1000:")
+    for book in ranking.rank_books(pool, QUERY, 5):
+        print(f"  {book.title} ({book.year}, owner_count={book.owner_count})")
+
+
+if __name__ == "__main__":
+    main()
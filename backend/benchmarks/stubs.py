@@ -0,0 +1,123 @@
+"""ベンチマーク用のCiNii Books API・OpenAI APIスタブ"""
+import asyncio
+import json
+import zlib
+from types import SimpleNamespace
+from typing import AsyncIterator
+import httpx
+from openai.types.chat import ChatCompletionChunk
+
+
+def make_cinii_payload(query: str, count: int = 10) -> dict:
+    """CiNii OpenSearch(JSON-LD)形式のレスポンスを生成する"""
+    items = []
+    seed = zlib.crc32(query.encode()) % 10**6
+    for i in range(count):
+        items.append({
+            "@id": f"https://ci.nii.ac.jp/ncid/BB{seed:06d}{i:02d}",
+            "title": f"{query} 入門 第{i + 1}巻",
+            "dc:creator": [f"著者{i}"],
+            "dc:publisher": ["岩波書店"],
+            "dc:date": str(2000 + i),
+            "cinii:ownerCount": str(100 - i),
+            "dcterms:hasPart": [{"@id": f"urn:isbn:9784{seed:06d}{i:03d}"}],
+        })
+    return {"@graph": [{"opensearch:totalResults": str(count * 5), "items": items}]}
+
+
+def stub_cinii_client(latency: float = 0.2) -> httpx.AsyncClient:
+    """一定の遅延でCiNii形式のレスポンスを返すhttpxクライアント"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        params = request.url.params
+        query = params.get("q") or params.get("author") or params.get("title") or "本"
+        count = int(params.get("count", 10))
+        return httpx.Response(200, json=make_cinii_payload(query, count))
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def chat_completion_sse(message: dict, usage: dict | None = None) -> bytes:
+    """assistantメッセージをChat Completionsのストリーミング形式（SSE）にする"""
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini"}
+    chunks = []
+    if message.get("tool_calls"):
+        for i, tool_call in enumerate(message["tool_calls"]):
+            chunks.append({**base, "choices": [{"index": 0, "delta": {"tool_calls": [{"index": i, **tool_call}]}}]})
+        finish_reason = "tool_calls"
+    else:
+        for word in message["content"].split(" "):
+            chunks.append({**base, "choices": [{"index": 0, "delta": {"content": word + " "}}]})
+        finish_reason = "stop"
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+    chunks.append({
+        **base,
+        "choices": [],
+        "usage": usage or {"prompt_tokens": 400, "completion_tokens": 60, "total_tokens": 460},
+    })
+    body = "".join(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n" for chunk in chunks)
+    return (body + "data: [DONE]\n\n").encode()
+
+
+ANSWER_TEXT = "おすすめの本は次の3冊です。 " * 20
+
+
+def stub_reply(body: dict) -> dict:
+    """1回目はsearch_booksのtool call、検索結果を受け取ったら（またはツールなしなら）回答を返す"""
+    tools_offered = body.get("tools") and body.get("tool_choice") != "none"
+    if any(message.get("role") == "tool" for message in body["messages"]) or not tools_offered:
+        return {"content": ANSWER_TEXT}
+    query = body["messages"][-1]["content"][:20]
+    return {"tool_calls": [{
+        "id": "call_stub",
+        "type": "function",
+        "function": {"name": "search_books", "arguments": json.dumps({"query": query}, ensure_ascii=False)},
+    }]}
+
+
+class StubOpenAI:
+    """SDKを通さないOpenAIクライアントの代役（chat.create_chat_stream が使う chat.completions.create だけを持つ）
+
+    チャンクは事前に組み立てたものを返すので、計測値はアプリ側の処理だけになる。
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._answer_chunks: list[ChatCompletionChunk] | None = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, *, timeout: float | None = None, **body) -> "StubStream":
+        await asyncio.sleep(self.latency)
+        reply = stub_reply(body)
+        if "tool_calls" in reply:
+            # tool callの引数は質問ごとに変わるのでキャッシュしない
+            return StubStream(_parse_sse(chat_completion_sse(reply)))
+        if self._answer_chunks is None:
+            self._answer_chunks = _parse_sse(chat_completion_sse(reply))
+        return StubStream(self._answer_chunks)
+
+
+class StubStream:
+    """組み立て済みのチャンクを返すストリーム（SDKの AsyncStream と同じく async with / async for で使う）"""
+
+    def __init__(self, chunks: list[ChatCompletionChunk]):
+        self._chunks = chunks
+
+    async def __aenter__(self) -> "StubStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        for chunk in self._chunks:
+            yield chunk
+
+
+def _parse_sse(body: bytes) -> list[ChatCompletionChunk]:
+    chunks = []
+    for line in body.decode().split("\n\n"):
+        data = line.removeprefix("data: ")
+        if data and data != "[DONE]":
+            chunks.append(ChatCompletionChunk.model_validate_json(data))
+    return chunks
@@ -0,0 +1,31 @@
+"""LLMに渡す検索結果の形式ごとのトークン数の比較（記録済みCiNiiレスポンスを使用）
+
+uv run python -m benchmarks.tool_payload_tokens
+"""
+import json
+from pathlib import Path
+from app.services.cinii import _parse_cinii_response
+from app.services.history import count_tokens
+from app.services.tool_payload import encode_search_result
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+FORMATS = ["json", "minimal", "table"]
+
+
+def main():
+    print(f"{'fixture':<28}{'books':>6}" + "".join(f"{fmt:>10}" for fmt in FORMATS))
+    for path in sorted(FIXTURES_DIR.glob("cinii_*.json")):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        books = _parse_cinii_response(data)
+        total = int(data["@graph"][0]["opensearch:totalResults"])
+        tokens = {fmt: count_tokens(encode_search_result(total, books, fmt)) for fmt in FORMATS}
+        baseline = tokens["json"]
+        cells = "".join(
+            f"{tokens[fmt]:>10}" if fmt == "json" else f"{tokens[fmt]:>5} ({tokens[fmt] / baseline:.0%})"
+            for fmt in FORMATS
+        )
+        print(f"{path.stem:<28}{len(books):>6}{cells}")
+
+
+if __name__ == "__main__":
+    main()
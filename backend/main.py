@@ -1,5 +1,53 @@
+import argparse
+import sys
+from pathlib import Path
+from app.config import get_settings
+from app.services.book_index import BookIndex
+from app.services.ingest import Checkpoint, IngestStats, ingest_file
+
+
+def ingest(args: argparse.Namespace) -> None:
+    """書誌データのダンプをローカル索引に取り込む"""
+    index_path = args.index or get_settings().book_index_path
+    index = BookIndex(index_path)
+    checkpoint = None if args.no_resume else Checkpoint(Path(index_path + ".ingest.json"))
+
+    def report(stats: IngestStats, total_bytes: int) -> None:
+        print(f"  {stats.summary(total_bytes)}", file=sys.stderr)
+
+    try:
+        for source in args.files:
+            print(f"{source}:", file=sys.stderr)
+            ingest_file(
+                Path(source),
+                index,
+                batch_size=args.batch_size,
+                checkpoint=checkpoint,
+                report=report,
+                report_interval=args.report_interval,
+            )
+        print(f"index: {index_path} ({index.count()} books)", file=sys.stderr)
+    finally:
+        index.close()
+
+
 def main():
-    print("Hello from backend!")
+    parser = argparse.ArgumentParser(description="Book Info Chat backend utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest",
+        help="CiNii形式のJSON-LD / JSONLダンプをローカル書誌索引に取り込む",
+    )
+    ingest_parser.add_argument("files", nargs="+", help=".json(CiNiiレスポンス形式) または .jsonl/.ndjson")
+    ingest_parser.add_argument("--index", help="索引ファイルのパス（デフォルト: BOOK_INDEX_PATH）")
+    ingest_parser.add_argument("--batch-size", type=int, default=1000)
+    ingest_parser.add_argument("--report-interval", type=float, default=5.0, help="進捗表示の間隔（秒）")
+    ingest_parser.add_argument("--no-resume", action="store_true", help="前回の途中から再開せず先頭から取り込む")
+    ingest_parser.set_defaults(func=ingest)
+
+    args = parser.parse_args()
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -22,6 +22,7 @@ export default function Home() {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [streamingLogs, setStreamingLogs] = useState<DebugLogEntry[]>([]);
+  const [streamingText, setStreamingText] = useState("");
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -38,6 +39,7 @@ export default function Home() {
     setIsLoading(true);
     setError(null);
     setStreamingLogs([]);
+    setStreamingText("");
 
     // Frontend → Backend のログを追加
     const frontendLog = createFrontendLog(
@@ -53,6 +55,7 @@ export default function Home() {
 
     const collectedLogs: DebugLogEntry[] = [frontendLog];
     let resultMessage: string = "";
+    let streamedText = "";
     let resultBooks: Book[] | null = null as Book[] | null;
 
     try {
@@ -61,6 +64,14 @@ export default function Home() {
           const logData = event.data as DebugLogEntry;
           collectedLogs.push(logData);
           setStreamingLogs([...collectedLogs]);
+        } else if (event.type === "delta") {
+          // 回答テキストを届いた分から表示する
+          streamedText += (event.data as { content: string }).content;
+          setStreamingText(streamedText);
+        } else if (event.type === "delta_reset") {
+          // 検索前の前置きは回答ではないので捨てる
+          streamedText = "";
+          setStreamingText("");
         } else if (event.type === "done") {
           const doneData = event.data as { message: string; books: Book[] | null };
           resultMessage = doneData.message;
@@ -92,6 +103,7 @@ export default function Home() {
     } finally {
       setIsLoading(false);
       setStreamingLogs([]);
+      setStreamingText("");
     }
   };
 
@@ -123,7 +135,7 @@ export default function Home() {
               <ChatMessage key={i} message={msg} books={msg.books} debugLogs={msg.debugLogs} />
             ))}
             {isLoading && (
-              <StreamingLogs logs={streamingLogs} />
+              <StreamingLogs logs={streamingLogs} text={streamingText} />
             )}
             <div ref={messagesEndRef} />
           </div>
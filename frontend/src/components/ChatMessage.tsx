@@ -18,6 +18,8 @@ const LOG_TYPE_CONFIG: Record<string, { icon: string; color: string }> = {
   tool_result: { icon: "→", color: "text-purple-500" },
   cinii_request: { icon: "→", color: "text-green-500" },
   cinii_response: { icon: "←", color: "text-green-500" },
+  response_cache: { icon: "⚡", color: "text-yellow-500" },
+  intent: { icon: "◇", color: "text-cyan-500" },
   error: { icon: "✕", color: "text-red-500" },
 };
 
@@ -83,6 +85,9 @@ function DebugLogItem({ log }: { log: DebugLogEntry }) {
           {config.icon}
         </span>
         <span className="text-gray-600 dark:text-gray-300">{log.summary}</span>
+        {log.duration_ms !== undefined && (
+          <span className="text-gray-400 shrink-0">+{Math.round(log.duration_ms)}ms</span>
+        )}
       </div>
 
       {log.details && (
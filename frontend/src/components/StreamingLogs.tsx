@@ -4,6 +4,7 @@ import { DebugLogEntry } from "@/lib/api";
 
 interface Props {
   logs: DebugLogEntry[];
+  text?: string;
 }
 
 const LOG_TYPE_CONFIG: Record<string, { icon: string; color: string }> = {
@@ -14,10 +15,12 @@ const LOG_TYPE_CONFIG: Record<string, { icon: string; color: string }> = {
   tool_result: { icon: "→", color: "text-purple-500" },
   cinii_request: { icon: "→", color: "text-green-500" },
   cinii_response: { icon: "←", color: "text-green-500" },
+  response_cache: { icon: "⚡", color: "text-yellow-500" },
+  intent: { icon: "◇", color: "text-cyan-500" },
   error: { icon: "✕", color: "text-red-500" },
 };
 
-export function StreamingLogs({ logs }: Props) {
+export function StreamingLogs({ logs, text }: Props) {
   return (
     <div className="flex justify-start mb-4">
       <div className="max-w-[80%] rounded-lg px-4 py-3 bg-gray-100 dark:bg-gray-800">
@@ -53,6 +56,12 @@ export function StreamingLogs({ logs }: Props) {
             );
           })}
         </div>
+
+        {text && (
+          <div className="mt-3 whitespace-pre-wrap text-sm">
+            {text}
+          </div>
+        )}
       </div>
     </div>
   );
@@ -13,15 +13,18 @@ export interface Book {
   year: string | null;
   isbn: string | null;
   description: string | null;
+  subjects?: string[] | null;
   owner_count: number | null;
   cinii_url: string;
 }
 
 export interface DebugLogEntry {
   timestamp: string;
-  type: "frontend_request" | "openai_request" | "openai_response" | "tool_call" | "tool_result" | "cinii_request" | "cinii_response" | "error";
+  type: "frontend_request" | "openai_request" | "openai_response" | "tool_call" | "tool_result" | "cinii_request" | "cinii_response" | "response_cache" | "intent" | "error";
   summary: string;
   details?: Record<string, unknown>;
+  elapsed_ms?: number;
+  duration_ms?: number;
 }
 
 export interface ChatResponse {
@@ -31,8 +34,8 @@ export interface ChatResponse {
 }
 
 export interface StreamEvent {
-  type: "log" | "done" | "error";
-  data: DebugLogEntry | { message: string; books: Book[] | null } | { message: string };
+  type: "log" | "delta" | "delta_reset" | "done" | "error";
+  data: DebugLogEntry | { content: string } | { message: string; books: Book[] | null } | { message: string } | Record<string, never>;
 }
 
 export async function sendChatMessage(